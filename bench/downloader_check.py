@@ -0,0 +1,271 @@
+"""Downloader check: comfy_worker.downloader against a local stand-in for the Hub
+
+Serves a few files the way huggingface.co does (HEAD with X-Linked-Size /
+X-Linked-Etag, ranged GETs) on HF_ENDPOINT and runs download_files() with
+1 MB chunks through these cases:
+
+- ranged: a multi-chunk file arrives as one Range request per chunk,
+  verified against the Hub's sha256 and recorded in the manifest
+- retry: a chunk whose response is cut short is retried and the file
+  still comes out intact
+- resume: a download whose chunk keeps failing is rerun, and only the
+  chunks missing from <target>.part.json are fetched again
+- sha256: a file that doesn't match its hash is rejected and its
+  .part/.part.json are removed
+
+    python bench/downloader_check.py
+
+Exits non-zero if a case fails.
+"""
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ID = "bench/model"
+CHUNK_MB = 1
+
+
+class FakeHub:
+    """Files of one repo at /{REPO_ID}/resolve/main/{filename}, with injectable failures"""
+
+    def __init__(self):
+        # filename -> {"data", "sha256"}; sha256 is what the Hub claims
+        self.files = {}
+        # (filename, range start) -> failure modes still to come
+        self._failures = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.hub = self
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-hub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add(self, filename, data, sha256=None):
+        self.files[filename] = {"data": data, "sha256": sha256 or hashlib.sha256(data).hexdigest()}
+
+    def fail(self, filename, start, *modes):
+        """Make the next GETs of the range starting at `start` fail: "error" (HTTP 500) or "short" (cut off)"""
+        with self._lock:
+            self._failures.setdefault((filename, start), []).extend(modes)
+
+    def clear_failures(self):
+        with self._lock:
+            self._failures.clear()
+
+    def next_failure(self, filename, start):
+        with self._lock:
+            modes = self._failures.get((filename, start))
+            return modes.pop(0) if modes else None
+
+    def ranges(self, filename):
+        """(start, end) of every GET of filename so far"""
+        with self._lock:
+            return [r for method, name, r in self.requests if method == "GET" and name == filename]
+
+    def log(self, method, filename, byte_range):
+        with self._lock:
+            self.requests.append((method, filename, byte_range))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _file(self):
+        prefix = f"/{REPO_ID}/resolve/main/"
+        filename = self.path.split("?")[0][len(prefix):] if self.path.startswith(prefix) else None
+        entry = self.server.hub.files.get(filename)
+        if entry is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        return filename, entry
+
+    def do_HEAD(self):
+        filename, entry = self._file()
+        if entry is None:
+            return
+        self.server.hub.log("HEAD", filename, None)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(entry["data"])))
+        self.send_header("ETag", f'"{entry["sha256"]}"')
+        self.send_header("X-Linked-Etag", f'"{entry["sha256"]}"')
+        self.send_header("X-Linked-Size", str(len(entry["data"])))
+        self.send_header("X-Repo-Commit", "0" * 40)
+        self.end_headers()
+
+    def do_GET(self):
+        filename, entry = self._file()
+        if entry is None:
+            return
+        data = entry["data"]
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        start, end = (int(match[1]), min(int(match[2]), len(data) - 1)) if match else (0, len(data) - 1)
+        hub = self.server.hub
+        hub.log("GET", filename, (start, end))
+
+        failure = hub.next_failure(filename, start)
+        if failure == "error":
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = data[start:end + 1]
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Length", str(len(body)))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if failure == "short":
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def _entry(root, filename):
+    return {
+        "repo_id": REPO_ID,
+        "filename": filename,
+        "target_dir": str(root / "models"),
+        "target_name": filename,
+    }
+
+
+def _check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def case_ranged(hub, root, downloader):
+    data = os.urandom(5 * downloader.CHUNK_SIZE + 12345)
+    hub.add("ranged.safetensors", data)
+    model = _entry(root, "ranged.safetensors")
+    downloader.download_files([model])
+
+    target = Path(model["target_dir"]) / model["target_name"]
+    _check(target.read_bytes() == data, "downloaded file differs from the served one")
+    ranges = sorted(hub.ranges("ranged.safetensors"))
+    _check(len(ranges) == 6, f"expected 6 ranged GETs, got {len(ranges)}")
+    _check(ranges[-1] == (5 * downloader.CHUNK_SIZE, len(data) - 1), f"last range is {ranges[-1]}")
+    manifest = downloader.read_manifest(model["target_dir"])["ranged.safetensors"]
+    _check(manifest["sha256"] == hashlib.sha256(data).hexdigest(), "manifest sha256 is wrong")
+    _check(downloader.is_verified(model), "file isn't verified after download")
+
+    hub.requests.clear()
+    downloader.download_files([model])
+    _check(not hub.ranges("ranged.safetensors"), "verified file was downloaded again")
+
+
+def case_retry(hub, root, downloader):
+    data = os.urandom(3 * downloader.CHUNK_SIZE)
+    hub.add("retry.safetensors", data)
+    hub.fail("retry.safetensors", downloader.CHUNK_SIZE, "short")
+    model = _entry(root, "retry.safetensors")
+    downloader.download_files([model])
+
+    target = Path(model["target_dir"]) / model["target_name"]
+    _check(target.read_bytes() == data, "file differs after a retried chunk")
+    starts = [start for start, _ in hub.ranges("retry.safetensors")]
+    _check(starts.count(downloader.CHUNK_SIZE) == 2, f"chunk 1 fetched {starts.count(downloader.CHUNK_SIZE)} times")
+
+
+def case_resume(hub, root, downloader):
+    data = os.urandom(4 * downloader.CHUNK_SIZE + 1)
+    hub.add("resume.safetensors", data)
+    failing = 2 * downloader.CHUNK_SIZE
+    hub.fail("resume.safetensors", failing, *["error"] * downloader.CHUNK_RETRIES)
+    model = _entry(root, "resume.safetensors")
+    try:
+        downloader.download_files([model])
+    except Exception:
+        pass
+    else:
+        raise AssertionError("download with a failing chunk succeeded")
+
+    target = Path(model["target_dir"]) / model["target_name"]
+    state = target.with_name(target.name + ".part.json")
+    _check(not target.exists(), "incomplete file was moved into place")
+    _check(state.exists(), "no .part.json left to resume from")
+
+    hub.requests.clear()
+    downloader.download_files([model])
+    _check(target.read_bytes() == data, "resumed file differs from the served one")
+    ranges = hub.ranges("resume.safetensors")
+    _check([start for start, _ in ranges] == [failing], f"resume fetched {ranges}, expected only chunk 2")
+    _check(not state.exists(), ".part.json left behind after finishing")
+
+
+def case_sha256(hub, root, downloader):
+    data = os.urandom(2 * downloader.CHUNK_SIZE)
+    hub.add("corrupt.safetensors", data, sha256=hashlib.sha256(b"something else").hexdigest())
+    model = _entry(root, "corrupt.safetensors")
+    try:
+        downloader.download_files([model])
+    except RuntimeError as e:
+        _check("sha256 mismatch" in str(e), f"unexpected error: {e}")
+    else:
+        raise AssertionError("file with the wrong sha256 was accepted")
+
+    target = Path(model["target_dir"]) / model["target_name"]
+    _check(not target.exists(), "mismatching file was moved into place")
+    _check(not target.with_name(target.name + ".part").exists(), ".part left behind")
+    _check(not target.with_name(target.name + ".part.json").exists(), ".part.json left behind")
+    _check(not downloader.is_verified(model), "mismatching file counts as verified")
+
+
+CASES = {"ranged": case_ranged, "retry": case_retry, "resume": case_resume, "sha256": case_sha256}
+
+
+def main():
+    hub = FakeHub().start()
+    # Both are read at import time
+    os.environ["HF_ENDPOINT"] = hub.endpoint
+    os.environ["DOWNLOAD_CHUNK_MB"] = str(CHUNK_MB)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from comfy_worker import downloader
+
+    failed = []
+    try:
+        for name, case in CASES.items():
+            root = Path(tempfile.mkdtemp(prefix=f"downloader-{name}-"))
+            hub.requests.clear()
+            hub.clear_failures()
+            try:
+                case(hub, root, downloader)
+            except Exception:
+                failed.append(name)
+                print(f"❌ {name}\n{traceback.format_exc()}")
+            else:
+                print(f"✅ {name}")
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+    finally:
+        hub.stop()
+
+    if failed:
+        print(f"{len(failed)} of {len(CASES)} cases failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"All {len(CASES)} cases passed")
+
+
+if __name__ == "__main__":
+    main()
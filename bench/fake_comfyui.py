@@ -0,0 +1,420 @@
+"""Fake ComfyUI server for benchmarks: the API surface the workers use, no GPU
+
+Implements POST /prompt, GET /history/{id}, GET /view, GET /system_stats,
+GET/POST /queue, POST /interrupt, POST /free and the /ws websocket
+(execution_start / executing / progress / executed / execution_success
+messages with timestamps, optional binary preview frames). Prompts run one at a time like in ComfyUI: each takes
+`delay` seconds plus `step_delay` per sampler step and image, then writes
+PNGs to <root>/output so local output reads work too, or sends them as
+binary frames for SaveImageWebsocket nodes.
+
+    python bench/fake_comfyui.py --port 8188 --delay 0.5
+
+or FakeComfyUI(...).start() from a script.
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _ws_frame(payload, opcode=0x81):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if len(payload) < 126:
+        header = struct.pack("!BB", opcode, len(payload))
+    elif len(payload) < 2**16:
+        header = struct.pack("!BBH", opcode, 126, len(payload))
+    else:
+        header = struct.pack("!BBQ", opcode, 127, len(payload))
+    return header + payload
+
+
+class FakeComfyUI:
+    """In-process ComfyUI stand-in; `host` is set once started"""
+
+    def __init__(
+        self, port=0, delay=0.05, step_delay=0.0, image_size=None, root=None, vram_gb=24, previews=False, vram_free_gb=None
+    ):
+        self.port = port
+        self.delay = delay
+        self.step_delay = step_delay
+        # Send a small JPEG preview frame with every progress step
+        self.previews = previews
+        # (width, height) for every image, None uses the workflow's latent size
+        self.image_size = image_size
+        self.vram_gb = vram_gb
+        # What /system_stats reports free, e.g. less than vram_gb to mimic resident models
+        self.vram_free_gb = vram_gb if vram_free_gb is None else vram_free_gb
+        self._own_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix="fake-comfyui-")
+        self.output_dir = os.path.join(self.root, "output")
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.history = {}
+        self.pending = []
+        self.running = None
+        self.prompts = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._sockets = {}
+        self._send_lock = threading.Lock()
+        self._images = {}
+        self._interrupted = set()
+        self.server = None
+        self.host = None
+
+    # -- lifecycle --
+
+    def start(self):
+        fake = self
+
+        class Handler(_Handler):
+            comfy = fake
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.server.daemon_threads = True
+        self.host = f"127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, name="fake-comfyui-http", daemon=True).start()
+        threading.Thread(target=self._executor, name="fake-comfyui-exec", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        with self._lock:
+            for sockets in self._sockets.values():
+                for conn in sockets:
+                    try:
+                        conn.close()
+                    except OSError:
+                        pass
+        if self._own_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    # -- websocket fan-out --
+
+    def send(self, client_id, msg_type, data):
+        self._send_frame(client_id, _ws_frame(json.dumps({"type": msg_type, "data": data})))
+
+    def send_preview(self, client_id, image, image_type=1):
+        # Same layout as ComfyUI: event type 1 (PREVIEW_IMAGE), image type (1 JPEG, 2 PNG), image
+        self._send_frame(client_id, _ws_frame(struct.pack(">II", 1, image_type) + image, opcode=0x82))
+
+    def _send_frame(self, client_id, frame):
+        with self._lock:
+            sockets = list(self._sockets.get(client_id, ()))
+        for conn in sockets:
+            try:
+                with self._send_lock:
+                    conn.sendall(frame)
+            except OSError:
+                self._drop_socket(client_id, conn)
+
+    def _add_socket(self, client_id, conn):
+        with self._lock:
+            self._sockets.setdefault(client_id, []).append(conn)
+
+    def _drop_socket(self, client_id, conn):
+        with self._lock:
+            if conn in self._sockets.get(client_id, []):
+                self._sockets[client_id].remove(conn)
+
+    # -- prompt execution --
+
+    def submit(self, workflow, client_id, number=None, prompt_id=None):
+        # Like ComfyUI, the lowest number runs first, by default in arrival order
+        prompt_id = prompt_id or str(uuid.uuid4())
+        with self._lock:
+            self.prompts += 1
+            number = self.prompts if number is None else float(number)
+            self.pending.append((number, prompt_id, client_id, workflow))
+        self._queue.put(prompt_id)
+        return prompt_id, number
+
+    def queue_state(self):
+        with self._lock:
+            running = [[self.running[0], self.running[1], {}, {}, []]] if self.running else []
+            pending = [[number, prompt_id, {}, {}, []] for number, prompt_id, _, _ in self.pending]
+        return {"queue_running": running, "queue_pending": pending}
+
+    def delete(self, prompt_ids):
+        with self._lock:
+            self.pending = [p for p in self.pending if p[1] not in prompt_ids]
+
+    def interrupt(self):
+        with self._lock:
+            if self.running:
+                self._interrupted.add(self.running[1])
+
+    def _executor(self):
+        while True:
+            self._queue.get()
+            with self._lock:
+                if not self.pending:
+                    continue  # deleted from the queue
+                job = min(self.pending, key=lambda p: (p[0], p[1]))
+                self.pending.remove(job)
+                self.running = job
+            try:
+                self._execute(*job)
+            finally:
+                with self._lock:
+                    self.running = None
+
+    def _execute(self, number, prompt_id, client_id, workflow):
+        started = _now_ms()
+        messages = [["execution_start", {"prompt_id": prompt_id, "timestamp": started}]]
+        self.send(client_id, "execution_start", {"prompt_id": prompt_id, "timestamp": started})
+
+        saves = _save_nodes(workflow)
+        duration = self.delay + self.step_delay * sum(steps * batch for _, _, _, steps, batch in saves)
+        save_ids = {node for node, *_ in saves}
+        for node in workflow:
+            if node not in save_ids:
+                self.send(client_id, "executing", {"node": node, "display_node": node, "prompt_id": prompt_id})
+        steps = max((steps for _, _, _, steps, _ in saves), default=1)
+        started_at = time.monotonic()
+        for step in range(1, steps + 1):
+            deadline = started_at + duration * step / steps
+            while time.monotonic() < deadline:
+                if prompt_id in self._interrupted:
+                    break
+                time.sleep(min(0.01, max(deadline - time.monotonic(), 0)))
+            if prompt_id in self._interrupted:
+                break
+            self.send(client_id, "progress", {"value": step, "max": steps, "prompt_id": prompt_id, "node": saves[0][0] if saves else None})
+            if self.previews:
+                self.send_preview(client_id, self._preview())
+
+        if prompt_id in self._interrupted:
+            self._interrupted.discard(prompt_id)
+            data = {"prompt_id": prompt_id, "node_id": None, "timestamp": _now_ms()}
+            self.send(client_id, "execution_interrupted", data)
+            messages.append(["execution_interrupted", data])
+            self._finish(prompt_id, workflow, {}, "error", messages)
+            return
+
+        outputs = {}
+        for node, width, height, _, batch in saves:
+            if workflow[node].get("class_type") == "SaveImageWebsocket":
+                # Like ComfyUI's websocket_image_save node: PNG frames while the node executes
+                self.send(client_id, "executing", {"node": node, "display_node": node, "prompt_id": prompt_id})
+                for _ in range(batch):
+                    self.send_preview(client_id, self._image(width, height), image_type=2)
+                continue
+            images = []
+            for i in range(batch):
+                filename = f"fake_{prompt_id[:8]}_{node}_{i}.png"
+                with open(os.path.join(self.output_dir, filename), "wb") as f:
+                    f.write(self._image(width, height))
+                images.append({"filename": filename, "subfolder": "", "type": "output"})
+            outputs[node] = {"images": images}
+            self.send(client_id, "executed", {"node": node, "display_node": node, "output": outputs[node], "prompt_id": prompt_id})
+
+        data = {"prompt_id": prompt_id, "timestamp": _now_ms()}
+        messages.append(["execution_success", data])
+        self._finish(prompt_id, workflow, outputs, "success", messages)
+        self.send(client_id, "execution_success", data)
+        self.send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _finish(self, prompt_id, workflow, outputs, status, messages):
+        with self._lock:
+            self.history[prompt_id] = {
+                "prompt": [0, prompt_id, workflow, {}, []],
+                "outputs": outputs,
+                "status": {"status_str": status, "completed": status == "success", "messages": messages},
+            }
+
+    def _preview(self):
+        if "preview" not in self._images:
+            buf = io.BytesIO()
+            Image.linear_gradient("L").resize((64, 64)).convert("RGB").save(buf, format="JPEG")
+            self._images["preview"] = buf.getvalue()
+        return self._images["preview"]
+
+    def _image(self, width, height):
+        size = self.image_size or (width, height)
+        if size not in self._images:
+            # Noise over a gradient: roughly the PNG size of a real render
+            gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+            noise = Image.effect_noise(size, 48).convert("RGB")
+            buf = io.BytesIO()
+            Image.blend(gradient, noise, 0.5).save(buf, format="PNG", compress_level=4)
+            self._images[size] = buf.getvalue()
+        return self._images[size]
+
+
+def _save_nodes(workflow):
+    """[(node_id, width, height, steps, batch_size)] for every SaveImage node"""
+    saves = []
+    for node_id, node in workflow.items():
+        if node.get("class_type") not in ("SaveImage", "SaveImageWebsocket"):
+            continue
+        found = {}
+        stack, seen = [node_id], set()
+        # Walk upstream to the sampler and the empty latent
+        while stack:
+            current = workflow.get(stack.pop()) or {}
+            inputs = current.get("inputs") or {}
+            for key in ("width", "height", "steps", "batch_size"):
+                if key in inputs and not isinstance(inputs[key], list):
+                    found.setdefault(key, inputs[key])
+            for value in inputs.values():
+                if isinstance(value, list) and value and isinstance(value[0], str) and value[0] not in seen:
+                    seen.add(value[0])
+                    stack.append(value[0])
+        saves.append((
+            node_id,
+            int(found.get("width", 1024)),
+            int(found.get("height", 1024)),
+            int(found.get("steps", 1)),
+            int(found.get("batch_size", 1)),
+        ))
+    return saves
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    comfy = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json", status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._json_body()
+        if path == "/prompt":
+            prompt_id, number = self.comfy.submit(
+                body.get("prompt") or {}, body.get("client_id"), body.get("number"), body.get("prompt_id")
+            )
+            self._send({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+        elif path == "/queue":
+            self.comfy.delete(set(body.get("delete") or []))
+            self._send(b"", status=200)
+        elif path in ("/interrupt", "/free"):
+            if path == "/interrupt":
+                self.comfy.interrupt()
+            self._send(b"", status=200)
+        else:
+            self._send({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/ws":
+            self._websocket(parse_qs(url.query).get("clientId", [""])[0])
+        elif url.path.startswith("/history/"):
+            prompt_id = url.path[len("/history/"):]
+            entry = self.comfy.history.get(prompt_id)
+            self._send({prompt_id: entry} if entry else {})
+        elif url.path == "/view":
+            query = parse_qs(url.query)
+            path = os.path.join(self.comfy.output_dir, query.get("subfolder", [""])[0], query.get("filename", [""])[0])
+            if not os.path.isfile(path):
+                self._send({"error": "not found"}, status=404)
+                return
+            with open(path, "rb") as f:
+                self._send(f.read(), "image/png")
+        elif url.path == "/system_stats":
+            vram = int(self.comfy.vram_gb * 1024**3)
+            free = int(self.comfy.vram_free_gb * 1024**3)
+            self._send({
+                "system": {"comfyui_version": "fake"},
+                "devices": [{"name": "fake", "type": "cuda", "index": 0, "vram_total": vram, "vram_free": free}],
+            })
+        elif url.path == "/queue":
+            self._send(self.comfy.queue_state())
+        else:
+            self._send({"error": "not found"}, status=404)
+
+    def _websocket(self, client_id):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        conn = self.connection
+        self.comfy._add_socket(client_id, conn)
+        self.comfy.send(client_id, "status", {"status": {"exec_info": {"queue_remaining": 0}}, "sid": client_id})
+        try:
+            # Only watch for the client going away, its frames carry nothing we need
+            while conn.recv(4096):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.comfy._drop_socket(client_id, conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds per prompt")
+    parser.add_argument("--step-delay", type=float, default=0.0, help="extra seconds per sampler step and image")
+    parser.add_argument("--image-size", help="WxH of every image (default: the workflow's size)")
+    parser.add_argument("--root", help="directory holding output/ (default: a temp dir)")
+    parser.add_argument("--previews", action="store_true", help="send a preview frame with every step")
+    parser.add_argument("--vram-gb", type=float, default=24, help="VRAM /system_stats reports")
+    parser.add_argument("--vram-free-gb", type=float, help="free VRAM /system_stats reports (default: all of it)")
+    args = parser.parse_args()
+
+    image_size = tuple(int(v) for v in args.image_size.lower().split("x")) if args.image_size else None
+    fake = FakeComfyUI(
+        args.port,
+        args.delay,
+        args.step_delay,
+        image_size,
+        args.root,
+        vram_gb=args.vram_gb,
+        previews=args.previews,
+        vram_free_gb=args.vram_free_gb,
+    ).start()
+    print(f"Fake ComfyUI on http://{fake.host} (outputs in {fake.output_dir})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
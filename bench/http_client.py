@@ -0,0 +1,108 @@
+"""Micro-benchmark: per-job HTTP overhead of one-shot requests vs the pooled ComfyClient
+
+Runs a local stub of the ComfyUI endpoints a job touches (/prompt,
+/history/{id}, /view) and replays the same call pattern per job twice:
+once with module-level requests.get/post (a new TCP connection per call,
+as the handlers used to) and once through comfy_worker.client.ComfyClient.
+
+    python bench/http_client.py --jobs 200 --polls 10 --image-kb 1500
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from comfy_worker.client import ComfyClient  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    image = b""
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(f'{{"prompt_id": "{uuid.uuid4()}"}}'.encode())
+
+    def do_GET(self):
+        if self.path.startswith("/history/"):
+            self._send(b"{}")
+        elif self.path.startswith("/view"):
+            self._send(self.image, "image/png")
+        else:
+            self._send(b'{"system": {}, "devices": []}')
+
+
+def job_oneshot(base_url, polls):
+    resp = requests.post(f"{base_url}/prompt", json={"prompt": {}}, timeout=180)
+    prompt_id = resp.json()["prompt_id"]
+    for _ in range(polls):
+        requests.get(f"{base_url}/history/{prompt_id}", timeout=30)
+    requests.get(f"{base_url}/view?filename=x.png&subfolder=&type=output", timeout=60).content
+
+
+def job_pooled(client, polls):
+    prompt_id = client.queue_prompt({})
+    for _ in range(polls):
+        client.history(prompt_id)
+    client.view("x.png")
+
+
+def run(name, job, jobs):
+    StubHandler.connections = 0
+    started = time.perf_counter()
+    for _ in range(jobs):
+        job()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:>10}: {elapsed / jobs * 1000:7.2f} ms/job  "
+        f"{StubHandler.connections / jobs:6.2f} connects/job"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=10, help="/history calls per job")
+    parser.add_argument("--image-kb", type=int, default=1500, help="size of the /view payload")
+    args = parser.parse_args()
+
+    StubHandler.image = os.urandom(args.image_kb * 1024)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_port}"
+
+    print(f"{args.jobs} jobs, 1 /prompt + {args.polls} /history + 1 /view ({args.image_kb} KB) each")
+    before = run("one-shot", lambda: job_oneshot(f"http://{host}", args.polls), args.jobs)
+    client = ComfyClient(host)
+    after = run("pooled", lambda: job_pooled(client, args.polls), args.jobs)
+    print(f"{'saved':>10}: {(before - after) / args.jobs * 1000:7.2f} ms/job ({before / after:.1f}x)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
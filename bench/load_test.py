@@ -0,0 +1,249 @@
+"""Load test: the workers' handlers end to end against a fake ComfyUI
+
+Starts bench/fake_comfyui.py in-process and drives each worker's handler
+(or async_handler with --mode async) with realistic payloads at the given
+concurrency. Reports throughput, latency percentiles and the per-stage
+breakdown from the responses' `timings`, i.e. everything the handler adds
+on top of ComfyUI's own execution time (--delay). With --instances N the
+worker dispatches to N fake servers, one per simulated GPU.
+
+    python bench/load_test.py --jobs 100 --concurrency 4 --delay 0.2
+    python bench/load_test.py --model flux2-dev --payload '{"num_images": 4}' --json
+    python bench/load_test.py --instances 4 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("TIMINGS_LOG", "0")
+os.environ.setdefault("RESULT_CACHE_MB", "0")
+from bench.fake_comfyui import FakeComfyUI  # noqa: E402
+from comfy_worker.models import MODELS  # noqa: E402
+from comfy_worker.worker import Worker  # noqa: E402
+
+# The README examples of each worker
+PAYLOADS = {
+    "z-image-turbo": {
+        "prompt": "a beautiful sunset over mountains",
+        "width": 1024,
+        "height": 1024,
+        "num_inference_steps": 9,
+        "guidance_scale": 0.0,
+    },
+    "flux2-dev": {
+        "prompt": "a beautiful sunset over mountains",
+        "width": 1024,
+        "height": 1024,
+        "steps": 20,
+        "cfg": 3.5,
+    },
+    "qwen-image-2512": {
+        "prompt": "a beautiful landscape with mountains and a lake",
+        "width": 1024,
+        "height": 1024,
+        "steps": 30,
+        "cfg": 7.0,
+    },
+}
+
+
+class BenchWorker(Worker):
+    """Worker wired to already running (fake) ComfyUIs: nothing to download or start"""
+
+    comfyui_checked = False
+
+    def download_model(self, name):
+        self.downloaded.add(name)
+
+    def start_comfyui(self):
+        if not self.comfyui_checked:
+            for instance in self.instances:
+                if not instance.client.is_up():
+                    raise RuntimeError(f"Fake ComfyUI at {instance.client.host} is not up")
+            self.comfyui_checked = True
+
+
+def _free_ports(count):
+    """First of `count` consecutive free ports, the worker puts its instances on port + i"""
+    for _ in range(100):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        if base + count > 65535:
+            continue
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as s:
+                    s.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+    raise RuntimeError(f"No {count} consecutive free ports")
+
+
+def start_fakes(count, **kwargs):
+    """(root, fakes): one fake ComfyUI, or `count` laid out like the worker's per-GPU instances"""
+    if count == 1:
+        fake = FakeComfyUI(**kwargs).start()
+        return fake.root, [fake]
+
+    root = tempfile.mkdtemp(prefix="fake-comfyui-")
+    base = _free_ports(count)
+    fakes = [
+        FakeComfyUI(port=base + i, root=os.path.join(root, "instances", f"cuda{i}"), **kwargs).start()
+        for i in range(count)
+    ]
+    return root, fakes
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def make_event(model, i, extra):
+    payload = dict(PAYLOADS[model], seed=random.randint(0, 2**32 - 1))
+    # --payload may set any of them, seed included
+    payload.update(extra)
+    return {"id": f"bench-{i}", "input": payload}
+
+
+def run_sync(worker, events, concurrency):
+    def one(event):
+        started = time.perf_counter()
+        response = worker.handler(event)
+        return time.perf_counter() - started, response
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, events))
+
+
+def run_async(worker, events, concurrency):
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(event):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await worker.async_handler(event)
+                return time.perf_counter() - started, response
+
+        try:
+            return await asyncio.gather(*(one(event) for event in events))
+        finally:
+            for instance in worker.instances:
+                await instance.aclient.close()
+
+    return asyncio.run(main())
+
+
+def bench_model(root, fakes, model, args, extra):
+    devices = list(range(len(fakes))) if len(fakes) > 1 else [None]
+    worker = BenchWorker(
+        [model], "bench", comfyui_path=root, port=fakes[0].server.server_port, warmup=[], devices=devices
+    )
+    events = [make_event(model, i, extra) for i in range(args.jobs)]
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        # One untimed job boots the worker, connects the listener and fills the pools
+        worker.handler(make_event(model, -1, extra))
+        started = time.perf_counter()
+        if args.mode == "async":
+            results = run_async(worker, events, args.concurrency)
+        else:
+            results = run_sync(worker, events, args.concurrency)
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, response in results if response.get("status") != "error"]
+    errors = [response.get("error") for _, response in results if response.get("status") == "error"]
+    stages = {}
+    for _, response in results:
+        for stage, ms in (response.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(ms)
+
+    return {
+        "model": model,
+        "mode": args.mode,
+        "instances": len(fakes),
+        "concurrency": args.concurrency,
+        "jobs": args.jobs,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput": len(latencies) / elapsed,
+        "latency_ms": {f"p{p}": percentile(latencies, p) * 1000 for p in (50, 90, 99)},
+        "stages_ms": {
+            stage: {"p50": percentile(values, 50), "p99": percentile(values, 99)} for stage, values in stages.items()
+        },
+    }
+
+
+def print_report(report):
+    latency = report["latency_ms"]
+    print(
+        f"\n{report['model']} ({report['mode']}, concurrency {report['concurrency']}, "
+        f"{report['instances']} instance(s)): "
+        f"{report['jobs']} jobs, {report['errors']} errors, {report['throughput']:.2f} jobs/s, "
+        f"latency p50 {latency['p50']:.1f} / p90 {latency['p90']:.1f} / p99 {latency['p99']:.1f} ms"
+    )
+    if report["first_error"]:
+        print(f"  first error: {report['first_error']}")
+    print(f"  {'stage':<14}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, values in report["stages_ms"].items():
+        print(f"  {stage:<14}{values['p50']:>10.1f}{values['p99']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", action="append", choices=sorted(MODELS), help="model(s) to test (default: all)")
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mode", choices=("sync", "async"), help="handler to drive (default: async above concurrency 1)")
+    parser.add_argument("--delay", type=float, default=0.1, help="fake execution seconds per prompt")
+    parser.add_argument("--step-delay", type=float, default=0.0, help="extra fake seconds per step and image")
+    parser.add_argument("--image-size", help="WxH of the fake images (default: the request's size)")
+    parser.add_argument("--payload", default="{}", help="JSON merged into every request's input")
+    parser.add_argument("--instances", type=int, default=1, help="fake ComfyUI servers, one per simulated GPU")
+    parser.add_argument("--vram-free-gb", type=float, help="free VRAM the fakes report (default: all 24 GB)")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+    args.mode = args.mode or ("async" if args.concurrency > 1 else "sync")
+
+    image_size = tuple(int(v) for v in args.image_size.lower().split("x")) if args.image_size else None
+    root, fakes = start_fakes(
+        args.instances,
+        delay=args.delay,
+        step_delay=args.step_delay,
+        image_size=image_size,
+        vram_free_gb=args.vram_free_gb,
+    )
+    try:
+        reports = [bench_model(root, fakes, model, args, json.loads(args.payload)) for model in args.model or MODELS]
+    finally:
+        for fake in fakes:
+            fake.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""ComfyUI custom node: CLIPTextEncode with a persistent conditioning cache
+
+CachedCLIPTextEncode returns the same CONDITIONING as CLIPTextEncode, cached
+on (encoder, text): an in-RAM LRU in the ComfyUI process backed by a
+size-bounded directory that survives restarts and can sit on a network
+volume. Its clip input is lazy, so on a hit the text encoder is neither
+loaded nor run and ComfyUI is free to keep it out of VRAM.
+
+Installed into ComfyUI's custom_nodes by the worker images; the worker
+swaps its CLIPTextEncode nodes for this one (comfy_worker/conditioning.py).
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import torch
+
+
+def _default_dir():
+    if os.path.isdir("/runpod-volume"):
+        return "/runpod-volume/conditioning-cache"
+    return "/root/.cache/conditioning-cache"
+
+
+CONDITIONING_CACHE_DIR = os.getenv("CONDITIONING_CACHE_DIR") or _default_dir()
+# Size bounds of the two tiers; 0 disables a tier
+CONDITIONING_CACHE_RAM_MB = int(os.getenv("CONDITIONING_CACHE_RAM_MB", "1024"))
+CONDITIONING_CACHE_DISK_MB = int(os.getenv("CONDITIONING_CACHE_DISK_MB", "8192"))
+
+
+def _nbytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _to_cpu(value):
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu")
+    if isinstance(value, dict):
+        return {k: _to_cpu(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_cpu(v) for v in value)
+    return value
+
+
+class ConditioningCache:
+    """In-RAM LRU of conditionings over an on-disk LRU (file mtime is the clock)"""
+
+    def __init__(self, root=CONDITIONING_CACHE_DIR, ram_mb=CONDITIONING_CACHE_RAM_MB, disk_mb=CONDITIONING_CACHE_DISK_MB):
+        self.root = Path(root)
+        self.ram_bytes = ram_mb * 1024 * 1024
+        self.disk_bytes = disk_mb * 1024 * 1024
+        self._ram = OrderedDict()
+        self._ram_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="conditioning-cache")
+
+    @staticmethod
+    def key(encoder, text):
+        return hashlib.sha256(f"{encoder}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.pt"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._ram:
+                self._ram.move_to_end(key)
+                return self._ram[key][0]
+
+        if self.disk_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            conditioning = torch.load(path, map_location="cpu", weights_only=True)
+            os.utime(path)
+        except Exception:
+            # Missing, half-written by a crashed worker or unreadable
+            return None
+        self._remember(key, conditioning)
+        return conditioning
+
+    def put(self, key, conditioning):
+        conditioning = _to_cpu(conditioning)
+        self._remember(key, conditioning)
+        if self.disk_bytes > 0:
+            self._writer.submit(self._store, key, conditioning)
+        return conditioning
+
+    def _remember(self, key, conditioning):
+        if self.ram_bytes <= 0:
+            return
+        size = _nbytes(conditioning)
+        with self._lock:
+            if key in self._ram:
+                return
+            self._ram[key] = (conditioning, size)
+            self._ram_size += size
+            while self._ram_size > self.ram_bytes and len(self._ram) > 1:
+                _, (_, evicted) = self._ram.popitem(last=False)
+                self._ram_size -= evicted
+
+    def _store(self, key, conditioning):
+        path = self._path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            torch.save(conditioning, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[conditioning-cache] could not store {key[:12]}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+
+        size = path.stat().st_size
+        with self._lock:
+            if self._disk_size is not None:
+                self._disk_size += size
+            if self._disk_size is not None and self._disk_size <= self.disk_bytes:
+                return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.pt"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        while total > self.disk_bytes and entries:
+            _, size, path = entries.pop(0)
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_size = total
+
+
+CACHE = ConditioningCache()
+
+
+class CachedCLIPTextEncode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "text": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+                # Identifies the text encoder (files, type), part of the cache key
+                "encoder": ("STRING", {"default": ""}),
+                "clip": ("CLIP", {"lazy": True}),
+            }
+        }
+
+    RETURN_TYPES = ("CONDITIONING",)
+    FUNCTION = "encode"
+    CATEGORY = "conditioning"
+    DESCRIPTION = "CLIPTextEncode that reuses conditionings cached on (encoder, text), skipping the text encoder on a hit."
+
+    def check_lazy_status(self, text, encoder, clip=None):
+        # Only evaluate (load) the text encoder on a cache miss; a disk hit
+        # is pulled into RAM here for encode()
+        if clip is None and CACHE.get(CACHE.key(encoder, text)) is None:
+            return ["clip"]
+        return []
+
+    def encode(self, text, encoder, clip=None):
+        key = CACHE.key(encoder, text)
+        conditioning = CACHE.get(key)
+        if conditioning is not None:
+            return (conditioning,)
+
+        if clip is None:
+            # Only if the entry was evicted right after check_lazy_status()
+            raise RuntimeError("Conditioning cache entry vanished before it could be used, retry the prompt")
+        started = time.perf_counter()
+        tokens = clip.tokenize(text)
+        conditioning = clip.encode_from_tokens_scheduled(tokens)
+        print(f"[conditioning-cache] encoded {key[:12]} in {time.perf_counter() - started:.2f}s")
+        return (CACHE.put(key, conditioning),)
+
+
+NODE_CLASS_MAPPINGS = {"CachedCLIPTextEncode": CachedCLIPTextEncode}
+NODE_DISPLAY_NAME_MAPPINGS = {"CachedCLIPTextEncode": "CLIP Text Encode (Cached)"}
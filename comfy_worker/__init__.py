@@ -0,0 +1 @@
+"""Shared helpers for the ComfyUI-based RunPod workers"""
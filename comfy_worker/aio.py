@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+import aiohttp
+
+from comfy_worker.client import output_dirs, read_local_output
+
+# Jobs RunPod may hand this worker at once; ComfyUI still runs prompts one by
+# one, but the next job is queued while earlier results are fetched/encoded
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "1"))
+
+
+class AsyncComfyClient:
+    """aiohttp client for the ComfyUI HTTP API, one session per event loop"""
+
+    def __init__(self, host="127.0.0.1:8188", comfyui_path=None):
+        self.base_url = f"http://{host}"
+        self.base_dirs = output_dirs(comfyui_path)
+        self._session = None
+        self._loop = None
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=60),
+            )
+            self._loop = loop
+        return self._session
+
+    async def queue_prompt(self, workflow, client_id, number=None, prompt_id=None):
+        payload = {"prompt": workflow, "client_id": client_id}
+        if number is not None:
+            payload["number"] = number
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
+        session = self._get_session()
+        async with session.post(
+            f"{self.base_url}/prompt",
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=180),
+        ) as resp:
+            text = await resp.text()
+            if resp.status != 200:
+                raise RuntimeError(f"ComfyUI /prompt failed ({resp.status}): {text}")
+            try:
+                result = await resp.json(content_type=None)
+            except Exception:
+                raise RuntimeError(f"ComfyUI /prompt returned non-JSON: {text}")
+
+        prompt_id = result.get("prompt_id")
+        if not prompt_id:
+            raise RuntimeError(f"No prompt_id in response: {result}")
+        return prompt_id
+
+    async def view(self, filename, subfolder="", folder_type="output", timeout=60):
+        session = self._get_session()
+        async with session.get(
+            f"{self.base_url}/view",
+            params={"filename": filename, "subfolder": subfolder, "type": folder_type},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    async def fetch_output(self, filename, subfolder="", folder_type="output", timeout=60):
+        """Output file bytes, from the local output dir if possible, else via /view"""
+        data = await asyncio.to_thread(read_local_output, self.base_dirs, filename, subfolder, folder_type)
+        if data is None:
+            data = await self.view(filename, subfolder, folder_type, timeout=timeout)
+        return data
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,58 @@
+import os
+
+# Upper bound on images per job so one request can't hog the GPU
+MAX_IMAGES = int(os.getenv("MAX_IMAGES", "8"))
+
+
+def parse_items(input_data, prompt, seed):
+    """Expand num_images / seeds / prompts into generation items
+
+    Each item is {"prompt", "seed", "batch_size"} and becomes one sampler
+    branch in the workflow. Plain num_images variations stay a single item
+    with a batched latent, so the text is encoded and sampled only once.
+    """
+    num_images = int(input_data.get("num_images") or 1)
+    prompts = input_data.get("prompts")
+    seeds = input_data.get("seeds")
+
+    if prompts:
+        if not isinstance(prompts, list):
+            raise ValueError("prompts must be a list of strings")
+        if seeds and not isinstance(seeds, list):
+            raise ValueError("seeds must be a list of integers")
+        if seeds and len(seeds) != len(prompts):
+            raise ValueError("seeds must have the same length as prompts")
+        items = [
+            {
+                "prompt": str(item_prompt),
+                "seed": int(seeds[i]) if seeds else (seed + i) % 2**32,
+                "batch_size": num_images,
+            }
+            for i, item_prompt in enumerate(prompts)
+        ]
+    elif seeds:
+        if not isinstance(seeds, list):
+            raise ValueError("seeds must be a list of integers")
+        items = [{"prompt": prompt, "seed": int(s), "batch_size": 1} for s in seeds]
+    else:
+        items = [{"prompt": prompt, "seed": seed, "batch_size": num_images}]
+
+    total = sum(item["batch_size"] for item in items)
+    if total < 1:
+        raise ValueError("num_images must be at least 1")
+    if total > MAX_IMAGES:
+        raise ValueError(f"Too many images requested ({total}), max is {MAX_IMAGES}")
+    return items
+
+
+def node_id(base, index):
+    """Node id for the index-th sampler branch (the first keeps the template id)"""
+    return base if index == 0 else f"{base}_{index}"
+
+
+def output_images(outputs, node_ids):
+    """Image infos from /history outputs, in branch order"""
+    images = []
+    for nid in node_ids:
+        images.extend((outputs.get(nid) or {}).get("images", []))
+    return images
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class Boot:
+    """Eager worker boot: runs the steps side by side and signals when all are done
+
+    Started at import time so the model download and ComfyUI startup overlap
+    each other and RunPod's own startup, instead of running serially inside
+    the first job. `after` steps (e.g. a warm-up) run one by one once all the
+    parallel steps succeeded, before the worker counts as ready.
+    """
+
+    def __init__(self, *steps, after=()):
+        self.steps = steps
+        self.after = after
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._errors = []
+        # Seconds each step took in the last boot, by step name
+        self.durations = {}
+
+    def start(self):
+        """Kick off the boot in the background (no-op if running or done)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.ready.clear()
+            self._errors = []
+            self._thread = threading.Thread(target=self._run, name="boot", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        started = time.time()
+
+        def run_step(step):
+            step_started = time.time()
+            try:
+                step()
+            except Exception as e:
+                print(f"❌ Boot step {step.__name__} failed: {e}")
+                self._errors.append(e)
+            else:
+                self.durations[step.__name__] = time.time() - step_started
+                print(f"⏱️ {step.__name__} done in {self.durations[step.__name__]:.1f}s")
+
+        threads = [
+            threading.Thread(target=run_step, args=(step,), name=f"boot-{step.__name__}", daemon=True)
+            for step in self.steps
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if not self._errors:
+            for step in self.after:
+                run_step(step)
+                if self._errors:
+                    break
+
+        if not self._errors:
+            print(f"🚀 Worker ready in {time.time() - started:.1f}s")
+        self.ready.set()
+
+    def wait(self, timeout=None):
+        """Block until the boot finished; raises if a step failed (the next call retries)"""
+        self.start()
+        if not self.ready.wait(timeout):
+            raise RuntimeError("Timed out waiting for worker boot")
+        if self._errors:
+            error = self._errors[0]
+            with self._lock:
+                if self.ready.is_set():
+                    self._thread = None
+            raise RuntimeError(f"Worker boot failed: {error}")
@@ -0,0 +1,162 @@
+import mmap
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts - ComfyUI is on localhost, a slow connect means it's down
+CONNECT_TIMEOUT = 2
+
+# "local" reads results straight from ComfyUI's output dir, "http" always uses /view
+OUTPUT_FETCH = os.getenv("OUTPUT_FETCH", "local")
+
+# Outputs at least this big are memory-mapped instead of read into a new buffer
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def output_dirs(comfyui_path):
+    """{folder_type: dir} for a local ComfyUI install, as used by /view"""
+    if not comfyui_path:
+        return {}
+    return {
+        "output": os.path.join(comfyui_path, "output"),
+        "temp": os.path.join(comfyui_path, "temp"),
+    }
+
+
+def read_local_output(base_dirs, filename, subfolder="", folder_type="output"):
+    """Bytes of a ComfyUI output file read from disk, or None if it isn't there
+
+    Large files come back as a read-only mmap so base64/Pillow can use them
+    without another full copy.
+    """
+    base_dir = base_dirs.get(folder_type)
+    if OUTPUT_FETCH != "local" or not base_dir or not filename:
+        return None
+
+    # Same containment check as ComfyUI's /view
+    base_dir = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base_dir, subfolder or "", filename))
+    if os.path.commonpath([base_dir, path]) != base_dir or not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ComfyClient:
+    """ComfyUI HTTP API client on a pooled keep-alive session
+
+    Every call reuses connections from the pool instead of opening a new TCP
+    connection to ComfyUI. Connection errors are retried for every call,
+    read errors and 5xx only for idempotent GETs (never a /prompt submit).
+    """
+
+    def __init__(self, host="127.0.0.1:8188", pool_size=16, comfyui_path=None):
+        self.host = host
+        self.base_url = f"http://{host}"
+        # ComfyUI runs on this machine, so results can be read from disk
+        self.base_dirs = output_dirs(comfyui_path)
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=2,
+            status=2,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+
+    def system_stats(self, timeout=1):
+        resp = self.session.get(f"{self.base_url}/system_stats", timeout=(CONNECT_TIMEOUT, timeout))
+        resp.raise_for_status()
+        return resp.json()
+
+    def is_up(self):
+        try:
+            self.system_stats()
+            return True
+        except Exception:
+            return False
+
+    def queue_prompt(self, workflow, client_id=None, number=None, prompt_id=None):
+        """POST /prompt, returns the prompt_id (ours if given); ComfyUI runs the lowest queue number first"""
+        payload = {"prompt": workflow}
+        if client_id:
+            payload["client_id"] = client_id
+        if number is not None:
+            payload["number"] = number
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
+        resp = self.session.post(f"{self.base_url}/prompt", json=payload, timeout=(CONNECT_TIMEOUT, 180))
+        if resp.status_code != 200:
+            raise RuntimeError(f"ComfyUI /prompt failed ({resp.status_code}): {resp.text}")
+
+        try:
+            result = resp.json()
+        except Exception:
+            raise RuntimeError(f"ComfyUI /prompt returned non-JSON: {resp.text}")
+
+        prompt_id = result.get("prompt_id")
+        if not prompt_id:
+            raise RuntimeError(f"No prompt_id in response: {result}")
+        return prompt_id
+
+    def history(self, prompt_id, timeout=10):
+        """History entry for prompt_id, or None while it hasn't finished"""
+        resp = self.session.get(f"{self.base_url}/history/{prompt_id}", timeout=(CONNECT_TIMEOUT, timeout))
+        if resp.status_code != 200:
+            return None
+        return resp.json().get(prompt_id)
+
+    def queue(self, timeout=5):
+        """GET /queue: {"queue_running": [...], "queue_pending": [...]}"""
+        resp = self.session.get(f"{self.base_url}/queue", timeout=(CONNECT_TIMEOUT, timeout))
+        resp.raise_for_status()
+        return resp.json()
+
+    def delete_queued(self, prompt_ids):
+        """POST /queue delete: drop pending prompts (running ones are left alone)"""
+        resp = self.session.post(
+            f"{self.base_url}/queue", json={"delete": list(prompt_ids)}, timeout=(CONNECT_TIMEOUT, 10)
+        )
+        resp.raise_for_status()
+
+    def interrupt(self, prompt_id=None):
+        """POST /interrupt: stop the running prompt (only if it is prompt_id, where ComfyUI supports that)"""
+        payload = {"prompt_id": prompt_id} if prompt_id else {}
+        resp = self.session.post(f"{self.base_url}/interrupt", json=payload, timeout=(CONNECT_TIMEOUT, 10))
+        resp.raise_for_status()
+
+    def free(self, unload_models=True, free_memory=True):
+        """POST /free, ComfyUI unloads models between prompts"""
+        resp = self.session.post(
+            f"{self.base_url}/free",
+            json={"unload_models": unload_models, "free_memory": free_memory},
+            timeout=(CONNECT_TIMEOUT, 10),
+        )
+        resp.raise_for_status()
+
+    def view(self, filename, subfolder="", folder_type="output", timeout=60):
+        """Raw bytes of an output file via /view"""
+        resp = self.session.get(
+            f"{self.base_url}/view",
+            params={"filename": filename, "subfolder": subfolder, "type": folder_type},
+            timeout=(CONNECT_TIMEOUT, timeout),
+        )
+        resp.raise_for_status()
+        return resp.content
+
+    def fetch_output(self, filename, subfolder="", folder_type="output", timeout=60):
+        """Output file bytes, from the local output dir if possible, else via /view"""
+        data = read_local_output(self.base_dirs, filename, subfolder, folder_type)
+        if data is None:
+            data = self.view(filename, subfolder, folder_type, timeout=timeout)
+        return data
@@ -0,0 +1,56 @@
+import json
+import os
+
+# "1" swaps the workflows' CLIPTextEncode nodes for CachedCLIPTextEncode
+# (comfy_nodes/conditioning_cache, installed into ComfyUI's custom_nodes by
+# the images), so repeated prompts skip the text encoder; "0" keeps them
+CONDITIONING_CACHE = os.getenv("CONDITIONING_CACHE", "1") == "1"
+
+CACHED_ENCODE = "CachedCLIPTextEncode"
+
+
+def encoder_id(workflow, link):
+    """Identity of whatever feeds a clip input: class and settings of every node upstream
+
+    Two encodes share cache entries only if their text encoders were
+    loaded (and patched) the same way.
+    """
+    chain = []
+    stack, seen = [link[0]], set()
+    while stack:
+        nid = stack.pop()
+        if nid in seen or nid not in workflow:
+            continue
+        seen.add(nid)
+        node = workflow[nid]
+        inputs = node.get("inputs") or {}
+        chain.append({
+            "class_type": node.get("class_type"),
+            **{key: value for key, value in inputs.items() if not isinstance(value, list)},
+        })
+        stack.extend(value[0] for value in inputs.values() if isinstance(value, list) and value)
+    return json.dumps({"output": link[1], "chain": chain}, sort_keys=True)
+
+
+def cached_encodes(workflow, enabled=CONDITIONING_CACHE):
+    """The workflow to submit: CLIPTextEncode nodes become CachedCLIPTextEncode when enabled
+
+    Node ids and outputs stay the same, the cached node only adds the
+    encoder identity for its cache key.
+    """
+    if not enabled:
+        return workflow
+    converted = {}
+    for nid, node in workflow.items():
+        if node.get("class_type") == "CLIPTextEncode":
+            inputs = node["inputs"]
+            node = {
+                "class_type": CACHED_ENCODE,
+                "inputs": {
+                    "text": inputs["text"],
+                    "encoder": encoder_id(workflow, inputs["clip"]),
+                    "clip": inputs["clip"],
+                },
+            }
+        converted[nid] = node
+    return converted
@@ -0,0 +1,29 @@
+import math
+import os
+
+# Seconds a prompt may take when the request has no `timeout`: a base (model
+# loading, queueing) plus seconds per megapixel-step of the job's cost
+# (comfy_worker/schema.py), capped at JOB_TIMEOUT_MAX, which also caps
+# requested timeouts
+JOB_TIMEOUT_BASE = float(os.getenv("JOB_TIMEOUT_BASE", "120"))
+JOB_TIMEOUT_PER_MP_STEP = float(os.getenv("JOB_TIMEOUT_PER_MP_STEP", "0.5"))
+JOB_TIMEOUT_MAX = float(os.getenv("JOB_TIMEOUT_MAX", "900"))
+
+# How long a cancelled prompt gets to leave ComfyUI's queue before the
+# server is considered stuck and restarted
+CANCEL_TIMEOUT = float(os.getenv("CANCEL_TIMEOUT", "30"))
+
+
+def job_timeout(input_data, cost):
+    """Seconds the job's prompt may run, from the request's `timeout` or a cost estimate"""
+    requested = input_data.get("timeout")
+    if requested is not None:
+        try:
+            timeout = float(requested)
+        except (TypeError, ValueError):
+            timeout = math.nan
+        if not math.isfinite(timeout) or timeout <= 0:
+            raise ValueError(f"timeout must be a positive number of seconds, got {requested!r}")
+    else:
+        timeout = JOB_TIMEOUT_BASE + JOB_TIMEOUT_PER_MP_STEP * cost
+    return min(timeout, JOB_TIMEOUT_MAX)
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import requests
+from huggingface_hub import constants, get_hf_file_metadata, hf_hub_url
+
+from comfy_worker.locks import FileLock
+
+# HTTP connections shared by all files being downloaded at once
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "16"))
+
+# Large files are fetched as parallel byte ranges of this size; a crashed
+# download resumes from the last finished chunk
+CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_MB", "64")) * 1024 * 1024
+
+CHUNK_RETRIES = 3
+
+# Per-directory record of verified files: {target_name: {"size", "sha256", ...}}
+MANIFEST_NAME = ".manifest.json"
+
+_sessions = threading.local()
+
+
+def _session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+def _is_sha256(etag):
+    return etag is not None and len(etag) == 64 and all(c in "0123456789abcdef" for c in etag)
+
+
+def _write_json(path, data):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def read_manifest(target_dir):
+    path = Path(target_dir) / MANIFEST_NAME
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def record_manifest(target_dir, target_name, entry):
+    # Other workers may update the same manifest on a shared volume
+    with FileLock(Path(target_dir) / f"{MANIFEST_NAME}.lock"):
+        manifest = read_manifest(target_dir)
+        manifest[target_name] = entry
+        _write_json(Path(target_dir) / MANIFEST_NAME, manifest)
+
+
+def sha256_file(path, block_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_verified(model):
+    """True if the target exists and matches the manifest (and any pinned size/sha256)"""
+    target_path = Path(model["target_dir"]) / model["target_name"]
+    if not target_path.exists():
+        return False
+
+    entry = read_manifest(model["target_dir"]).get(model["target_name"])
+    if entry is None:
+        # Pre-existing file (baked into the image or from an older worker)
+        return "size" not in model and "sha256" not in model
+    if target_path.stat().st_size != entry.get("size"):
+        return False
+    if model.get("size") is not None and model["size"] != entry.get("size"):
+        return False
+    if model.get("sha256") and model["sha256"] != entry.get("sha256"):
+        return False
+    return True
+
+
+class _FileDownload:
+    """One file fetched as parallel ranged chunks into <target>.part"""
+
+    def __init__(self, model, token, pool):
+        self.model = model
+        self.target_path = Path(model["target_dir"]) / model["target_name"]
+        self.part_path = self.target_path.with_name(self.target_path.name + ".part")
+        self.state_path = self.target_path.with_name(self.target_path.name + ".part.json")
+        self.lock = threading.Lock()
+
+        meta = get_hf_file_metadata(
+            hf_hub_url(model["repo_id"], model["filename"], revision=model.get("revision")),
+            token=token,
+        )
+        self.url = meta.location
+        self.size = meta.size
+        if model.get("size") is not None and self.size is not None and model["size"] != self.size:
+            raise RuntimeError(f"{model['target_name']}: Hub reports {self.size} bytes, manifest pins {model['size']}")
+        self.size = model.get("size") or self.size
+        self.sha256 = model.get("sha256") or (meta.etag if _is_sha256(meta.etag) else None)
+
+        # The token must only go to the Hub itself, not to the CDN it redirects to
+        self.headers = {}
+        if token and self.url.startswith(constants.ENDPOINT):
+            self.headers["Authorization"] = f"Bearer {token}"
+
+        if self.size:
+            self.chunks = [(start, min(start + CHUNK_SIZE, self.size) - 1) for start in range(0, self.size, CHUNK_SIZE)]
+        else:
+            self.chunks = [None]
+        self.done = self._load_state()
+
+        self.target_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if self.size:
+            os.ftruncate(self.fd, self.size)
+
+        if self.done:
+            print(f"   ↩️ Resuming {model['target_name']} ({len(self.done)}/{len(self.chunks)} chunks done)")
+        self.started = time.time()
+        self.futures = [
+            pool.submit(self._fetch, i, chunk)
+            for i, chunk in enumerate(self.chunks)
+            if i not in self.done
+        ]
+
+    def _load_state(self):
+        """Finished chunk indices from a previous run, if it was the same file"""
+        try:
+            state = json.loads(self.state_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return set()
+        if (
+            state.get("size") != self.size
+            or state.get("sha256") != self.sha256
+            or state.get("chunk_size") != CHUNK_SIZE
+            or not self.part_path.exists()
+        ):
+            return set()
+        return set(state.get("done", []))
+
+    def _save_state(self):
+        _write_json(self.state_path, {
+            "size": self.size,
+            "sha256": self.sha256,
+            "chunk_size": CHUNK_SIZE,
+            "done": sorted(self.done),
+        })
+
+    def _fetch(self, index, chunk):
+        headers = dict(self.headers)
+        if chunk is not None:
+            headers["Range"] = f"bytes={chunk[0]}-{chunk[1]}"
+
+        for attempt in range(CHUNK_RETRIES):
+            offset = chunk[0] if chunk is not None else 0
+            try:
+                with _session().get(self.url, headers=headers, stream=True, timeout=(10, 60)) as resp:
+                    resp.raise_for_status()
+                    if chunk is not None and resp.status_code != 206 and len(self.chunks) > 1:
+                        raise RuntimeError(f"Server ignored Range request for {self.model['target_name']}")
+                    for block in resp.iter_content(1024 * 1024):
+                        os.pwrite(self.fd, block, offset)
+                        offset += len(block)
+                if chunk is not None and offset != chunk[1] + 1:
+                    raise RuntimeError(f"Short read ({offset - chunk[0]} of {chunk[1] - chunk[0] + 1} bytes)")
+                break
+            except Exception as e:
+                if attempt == CHUNK_RETRIES - 1:
+                    raise
+                print(f"   ⚠️ Chunk {index} of {self.model['target_name']} failed ({e}), retrying...")
+                time.sleep(2 ** attempt)
+
+        if chunk is not None:
+            with self.lock:
+                self.done.add(index)
+                self._save_state()
+
+    def finish(self):
+        """Wait for all chunks, verify size/sha256 and move the file into place"""
+        try:
+            for future in self.futures:
+                future.result()
+        except Exception:
+            # Let in-flight chunks stop writing before the fd goes away
+            for future in self.futures:
+                future.cancel()
+            wait(self.futures)
+            raise
+        finally:
+            os.close(self.fd)
+
+        name = self.model["target_name"]
+        size = self.part_path.stat().st_size
+        if self.size and size != self.size:
+            raise RuntimeError(f"{name}: size mismatch ({size} != {self.size})")
+        # Hash only what we can check against, it's several GB for the big files
+        sha256 = sha256_file(self.part_path) if self.sha256 else None
+        if sha256 and sha256 != self.sha256:
+            self.part_path.unlink(missing_ok=True)
+            self.state_path.unlink(missing_ok=True)
+            raise RuntimeError(f"{name}: sha256 mismatch ({sha256} != {self.sha256})")
+
+        os.replace(self.part_path, self.target_path)
+        self.state_path.unlink(missing_ok=True)
+        record_manifest(self.model["target_dir"], name, {
+            "repo_id": self.model["repo_id"],
+            "filename": self.model["filename"],
+            "size": size,
+            "sha256": sha256,
+        })
+
+        elapsed = max(time.time() - self.started, 1e-6)
+        print(f"   ✅ {name} downloaded ({size / 1e9:.2f} GB, {size / 1e6 / elapsed:.0f} MB/s)")
+        return self.target_path
+
+
+def download_files(models, token=None, connections=None):
+    """Download model files concurrently, chunked, resumable and verified
+
+    models are dicts with repo_id, filename, target_dir, target_name and
+    optionally revision, size and sha256 to pin against. Without a pinned
+    sha256 the Hub's LFS hash is used.
+    """
+    pending = []
+    for model in models:
+        if is_verified(model):
+            print(f"   ✅ {model['target_name']} already exists")
+        else:
+            pending.append(model)
+    if not pending:
+        return
+
+    print(f"📥 Downloading {', '.join(m['target_name'] for m in pending)}...")
+    errors = []
+    with ThreadPoolExecutor(connections or DOWNLOAD_CONNECTIONS, thread_name_prefix="download") as pool:
+        def run(model):
+            try:
+                _FileDownload(model, token, pool).finish()
+            except Exception as e:
+                print(f"   ❌ Failed to download {model['target_name']}: {e}")
+                errors.append(e)
+
+        # One coordinator per file so hashing one file overlaps downloading the rest
+        with ThreadPoolExecutor(len(pending), thread_name_prefix="download-file") as files:
+            list(files.map(run, pending))
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,116 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Pillow releases the GIL while encoding, so threads are enough to keep
+# re-encoding off the request path and overlapping the next generation
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+
+FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+
+_pool = ThreadPoolExecutor(ENCODE_WORKERS, thread_name_prefix="encode")
+
+
+def parse_options(input_data):
+    """output_format / quality / thumbnail_size from the job input"""
+    output_format = str(input_data.get("output_format") or "png").lower()
+    if output_format not in FORMATS:
+        raise ValueError(f"output_format must be one of {', '.join(sorted(FORMATS))}")
+
+    quality = input_data.get("quality") or 90
+    try:
+        quality = int(quality)
+    except (TypeError, ValueError):
+        raise ValueError(f"quality must be a number from 1 to 100, got {quality!r}")
+    quality = max(1, min(quality, 100))
+
+    thumbnail_size = input_data.get("thumbnail_size")
+    if thumbnail_size is not None:
+        sides = thumbnail_size if isinstance(thumbnail_size, (list, tuple)) else [thumbnail_size] * 2
+        invalid = ValueError(f"thumbnail_size must be a size or a [width, height] pair, got {thumbnail_size!r}")
+        if len(sides) != 2:
+            raise invalid
+        try:
+            thumbnail_size = (int(sides[0]), int(sides[1]))
+        except (TypeError, ValueError):
+            raise invalid
+        if min(thumbnail_size) < 1:
+            raise ValueError(f"thumbnail_size must be positive, got {thumbnail_size!r}")
+
+    return {
+        "format": "jpeg" if output_format == "jpg" else output_format,
+        "quality": quality,
+        "thumbnail_size": thumbnail_size,
+    }
+
+
+def _png_size(data):
+    # Width/height straight from the IHDR chunk, no decode needed
+    return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+
+
+def _save(image, options):
+    pil_format = FORMATS[options["format"]]
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buf = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buf, format=pil_format, compress_level=4)
+    else:
+        image.save(buf, format=pil_format, quality=options["quality"])
+    return buf.getvalue()
+
+
+def encode_image(data, options):
+    """Re-encode one ComfyUI PNG per options
+
+    Returns {"data", "format", "bytes", "width", "height"} plus a
+    "thumbnail" dict of the same shape when thumbnail_size is set. PNG
+    without a thumbnail is passed through untouched.
+    """
+    if options["format"] == "png" and not options["thumbnail_size"]:
+        width, height = _png_size(data)
+        return {
+            "data": data,
+            "format": "png",
+            "bytes": len(data),
+            "width": width,
+            "height": height,
+        }
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    encoded = _save(image, options)
+    result = {
+        "data": encoded,
+        "format": options["format"],
+        "bytes": len(encoded),
+        "width": image.width,
+        "height": image.height,
+    }
+
+    if options["thumbnail_size"]:
+        thumb = image.copy()
+        thumb.thumbnail(options["thumbnail_size"])
+        thumb_encoded = _save(thumb, options)
+        result["thumbnail"] = {
+            "data": thumb_encoded,
+            "format": options["format"],
+            "bytes": len(thumb_encoded),
+            "width": thumb.width,
+            "height": thumb.height,
+        }
+    return result
+
+
+def submit(data, options, timings=None):
+    """Encode in the background pool, returns a concurrent.futures.Future
+
+    With timings, the encode time is added to its "encode" stage.
+    """
+    fn = encode_image if timings is None else timings.timed("encode", encode_image)
+    return _pool.submit(fn, data, options)
+
@@ -0,0 +1,255 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from comfy_worker.aio import AsyncComfyClient
+from comfy_worker.client import ComfyClient
+from comfy_worker.deadlines import CANCEL_TIMEOUT
+from comfy_worker.progress import PREVIEW_METHOD
+from comfy_worker.residency import ResidentModels
+from comfy_worker.supervisor import ComfyUICrashed, LogBuffer, Supervisor
+from comfy_worker.ws import CompletionListener
+
+# CUDA devices to run a ComfyUI on, comma separated indices; unset uses
+# CUDA_VISIBLE_DEVICES or whatever nvidia-smi lists
+COMFYUI_DEVICES = os.getenv("COMFYUI_DEVICES")
+
+# Seconds a ComfyUI server gets to answer /system_stats after launch
+STARTUP_TIMEOUT = 120
+
+
+def detect_devices():
+    """CUDA device indices to start one ComfyUI each on, [None] for a single unpinned one"""
+    if COMFYUI_DEVICES is not None:
+        devices = COMFYUI_DEVICES.split(",")
+    elif os.getenv("CUDA_VISIBLE_DEVICES"):
+        devices = os.environ["CUDA_VISIBLE_DEVICES"].split(",")
+    else:
+        try:
+            result = subprocess.run(
+                ["nvidia-smi", "--query-gpu=index", "--format=csv,noheader"],
+                capture_output=True, text=True, timeout=10, check=True,
+            )
+            devices = result.stdout.splitlines()
+        except Exception:
+            devices = []
+
+    # ComfyUI's --cuda-device takes an index, not a GPU UUID
+    devices = [int(d) for d in (d.strip() for d in devices) if d.isdigit()]
+    return devices if len(devices) > 1 else [None]
+
+
+class ComfyInstance:
+    """One ComfyUI server process with its clients, listener and resident models
+
+    With several GPUs every instance is pinned to one with --cuda-device
+    and gets its own output/temp dirs: ComfyUI picks output filenames by
+    scanning the directory, so two servers sharing one would race.
+    """
+
+    def __init__(self, comfyui_path, port, device=None):
+        self.comfyui_path = comfyui_path
+        self.port = port
+        self.device = device
+        self.name = "comfyui" if device is None else f"cuda:{device}"
+        if device is None:
+            self.data_dir = comfyui_path
+        else:
+            self.data_dir = os.path.join(comfyui_path, "instances", f"cuda{device}")
+        self.output_dir = os.path.join(self.data_dir, "output")
+
+        host = f"127.0.0.1:{port}"
+        self.client = ComfyClient(host, comfyui_path=self.data_dir)
+        self.aclient = AsyncComfyClient(host, comfyui_path=self.data_dir)
+        self.listener = CompletionListener(self.client)
+        self.resident = ResidentModels(self.client)
+        self.log = LogBuffer(prefix="" if device is None else f"[{self.name}] ")
+        self.supervisor = Supervisor(self, startup=STARTUP_TIMEOUT)
+        self.process = None
+        self._process_lock = threading.Lock()
+        # Jobs dispatched here that haven't finished generating yet
+        self.inflight = 0
+        self._vram_total = None
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def launch(self, reason=None):
+        """Start the server process without waiting for it (no-op while it's running)"""
+        with self._process_lock:
+            if self.running():
+                return False
+            if self.process is not None:
+                # A relaunch: whatever was queued on the old process is lost
+                reason = reason or f"exited with code {self.process.returncode}"
+                self.listener.fail_all(ComfyUICrashed(f"ComfyUI ({self.name}) {reason}"))
+            self._spawn()
+        self.supervisor.start()
+        return True
+
+    def _spawn(self):
+        self.resident.clear()
+        args = [sys.executable, "-u", "main.py", "--listen", "0.0.0.0", "--port", str(self.port)]
+        if self.device is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            args += [
+                "--cuda-device", str(self.device),
+                "--output-directory", self.output_dir,
+                # ComfyUI uses <dir>/temp and wipes it on startup
+                "--temp-directory", self.data_dir,
+            ]
+        if PREVIEW_METHOD != "none":
+            args += ["--preview-method", PREVIEW_METHOD]
+        # Output goes through a pipe we always drain, a full pipe would stall ComfyUI
+        self.process = subprocess.Popen(args, cwd=self.comfyui_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.log.drain(self.process.stdout, on_close=self.supervisor.process_exited)
+
+    def kill(self):
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def crashed(self, error):
+        """Whether error came from the server going down, i.e. the prompt may be resubmitted"""
+        return isinstance(error, ComfyUICrashed) or not self.running()
+
+    @contextmanager
+    def attach_log(self):
+        """Attach the tail of this server's log to exceptions leaving the block (for error responses)"""
+        try:
+            yield
+        except Exception as e:
+            if getattr(e, "comfyui_log", None) is None:
+                e.comfyui_log = self.log.tail()
+            raise
+
+    def wait_ready(self, timeout=STARTUP_TIMEOUT):
+        for _ in range(timeout):
+            if self.client.is_up():
+                return
+            if self.process is not None and self.process.poll() is not None:
+                break
+            time.sleep(1)
+        raise RuntimeError(f"ComfyUI server failed to start ({self.name}, port {self.port})")
+
+    def _device_stat(self, key):
+        # One of /system_stats' figures for our GPU, None if unknown
+        try:
+            devices = self.client.system_stats(timeout=2).get("devices") or []
+        except Exception:
+            return None
+        return devices[0].get(key) if devices else None
+
+    def free_vram(self):
+        """Free VRAM in bytes as this ComfyUI reports it, None if unknown"""
+        return self._device_stat("vram_free")
+
+    def vram_total(self):
+        """The GPU's VRAM in bytes as this ComfyUI reports it (asked until known), None if unknown"""
+        if self._vram_total is None:
+            self._vram_total = self._device_stat("vram_total")
+        return self._vram_total
+
+    def queued(self):
+        """(running, pending) prompt ids in this ComfyUI's /queue"""
+        queue = self.client.queue()
+        return (
+            [entry[1] for entry in queue.get("queue_running") or []],
+            [entry[1] for entry in queue.get("queue_pending") or []],
+        )
+
+    def queue_depth(self):
+        """Prompts running or pending in this ComfyUI's /queue"""
+        running, pending = self.queued()
+        return len(running) + len(pending)
+
+    def cancel(self, prompt_id, timeout=CANCEL_TIMEOUT):
+        """Take prompt_id off this server and wait until it's gone
+
+        Drops it from the queue if it's pending and interrupts it if it's
+        running, so nobody's next prompt waits behind work no one will
+        collect. A server that won't let go of it is restarted.
+        """
+        process = self.process
+        try:
+            self.client.delete_queued([prompt_id])
+            deadline = time.monotonic() + timeout
+            interrupted = False
+            while True:
+                running, pending = self.queued()
+                if prompt_id not in running and prompt_id not in pending:
+                    print(f"🛑 Cancelled prompt {prompt_id} on {self.name}")
+                    return
+                if prompt_id in running and not interrupted:
+                    self.client.interrupt(prompt_id)
+                    interrupted = True
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.1)
+        except Exception as e:
+            if self.running() and self.client.is_up():
+                print(f"⚠️ Could not cancel prompt {prompt_id} on {self.name}: {e}")
+                return
+        self.supervisor.recover(f"didn't stop prompt {prompt_id} within {timeout:.0f}s", process)
+
+
+class InstancePool:
+    """Dispatches prompts to the least loaded ComfyUI instance
+
+    Load is the instance's /queue depth, or the jobs we dispatched there
+    and haven't seen finish if that's higher (they may not be queued yet).
+    Between equally loaded instances the one already holding the model
+    wins, saving a weight load.
+    """
+
+    def __init__(self, instances):
+        self.instances = list(instances)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __iter__(self):
+        return iter(self.instances)
+
+    def acquire(self, name, size):
+        """Pick an instance for a prompt of model name (size bytes); release() it when done"""
+        depths = {}
+        if len(self.instances) > 1:
+            for instance in self.instances:
+                try:
+                    depths[instance.name] = instance.queue_depth()
+                except Exception:
+                    depths[instance.name] = 0
+
+        with self._lock:
+            instance = min(
+                self.instances,
+                key=lambda i: (max(depths.get(i.name, 0), i.inflight), name not in i.resident.resident()),
+            )
+            instance.inflight += 1
+        try:
+            instance.resident.acquire(name, size, busy=lambda: self.busy(instance, depths))
+        except Exception:
+            self.release(instance)
+            raise
+        return instance
+
+    def busy(self, instance, depths):
+        """Whether instance has prompts queued besides the one just dispatched there"""
+        if instance.inflight > 1:
+            return True
+        if instance.name not in depths:
+            try:
+                depths[instance.name] = instance.queue_depth()
+            except Exception:
+                depths[instance.name] = 0
+        return depths[instance.name] > 0
+
+    def release(self, instance):
+        with self._lock:
+            instance.inflight -= 1
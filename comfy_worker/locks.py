@@ -0,0 +1,53 @@
+import fcntl
+import os
+import threading
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class FileLock:
+    """Exclusive lock on a lock file, held against other threads and processes
+
+    flock() keeps other processes out, also other workers sharing the file
+    on a network volume; the per-path thread lock keeps out other threads of
+    this process. The lock dies with the process, so a crashed holder never
+    leaves it stuck.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with _thread_locks_guard:
+            self._thread_lock = _thread_locks.setdefault(self.path, threading.Lock())
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with blocking=False returns False instead of waiting"""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+        except Exception:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
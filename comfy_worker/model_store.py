@@ -0,0 +1,92 @@
+import os
+from pathlib import Path
+
+from comfy_worker.downloader import download_files, is_verified
+from comfy_worker.locks import FileLock
+
+
+def _default_root():
+    # On a network volume every worker of the endpoint shares one copy
+    if os.path.isdir("/runpod-volume"):
+        return "/runpod-volume/models"
+    return "/root/model-store"
+
+
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR") or _default_root()
+
+
+class ModelStore:
+    """Model files kept once under root and symlinked into ComfyUI's models dir
+
+    Files live at root/<repo_id>/<revision>/<filename>, with the downloader's
+    size/sha256 manifest next to them. A lock file per model file makes sure
+    only one worker (or thread) downloads a missing file; the others wait
+    for it and then reuse it. Targets are symlinks, never copies.
+    """
+
+    def __init__(self, root=MODEL_STORE_DIR):
+        self.root = Path(root)
+
+    def persistent(self):
+        """Whether the store outlives this worker, i.e. is on the network volume"""
+        return self.root.resolve().is_relative_to(Path("/runpod-volume").resolve())
+
+    def entry(self, model):
+        """The downloader entry for model's copy in the store"""
+        path = self.root / model["repo_id"] / (model.get("revision") or "main") / model["filename"]
+        return dict(model, target_dir=str(path.parent), target_name=path.name)
+
+    def _lock(self, entry):
+        return FileLock(Path(entry["target_dir"]) / f".{entry['target_name']}.lock")
+
+    def fetch(self, models, token=None):
+        """Make sure every model file is in the store and linked at its target"""
+        pending = [(model, self.entry(model)) for model in models]
+        for _, entry in pending:
+            Path(entry["target_dir"]).mkdir(parents=True, exist_ok=True)
+
+        while pending:
+            mine, theirs, locks = [], [], []
+            for model, entry in pending:
+                lock = self._lock(entry)
+                if lock.acquire(blocking=False):
+                    locks.append(lock)
+                    mine.append((model, entry))
+                else:
+                    theirs.append((model, entry))
+
+            try:
+                # Already verified files are skipped by the downloader
+                if mine:
+                    download_files([entry for _, entry in mine], token=token)
+            finally:
+                for lock in locks:
+                    lock.release()
+            for model, entry in mine:
+                self.link(model, entry)
+
+            # Someone else is downloading these: wait until they let go, then
+            # reuse their copy, or take over if they failed
+            pending = []
+            for model, entry in theirs:
+                print(f"   ⏳ {entry['target_name']} is being downloaded by another worker, waiting...")
+                with self._lock(entry):
+                    pass
+                if is_verified(entry):
+                    self.link(model, entry)
+                else:
+                    pending.append((model, entry))
+
+    def link(self, model, entry):
+        """Point model's target at the store copy (atomically replacing whatever is there)"""
+        source = Path(entry["target_dir"]) / entry["target_name"]
+        target = Path(model["target_dir"]) / model["target_name"]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.is_symlink() and os.readlink(target) == str(source):
+            return
+
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.link")
+        tmp.unlink(missing_ok=True)
+        os.symlink(source, tmp)
+        os.replace(tmp, target)
+        print(f"   🔗 {target} -> {source}")
@@ -0,0 +1,18 @@
+"""Model registry: name -> module with the model's manifest and workflow builder
+
+Each model module defines NAME, LABEL, FILES (HF files, target_dir relative
+to ComfyUI's models dir), DEFAULTS, LIMITS, WARMUP, RESPONSE and
+build_workflow(items, width, height, steps, cfg, weight_dtype) -> (workflow,
+save_nodes); weight_dtype is a comfy_worker.precision policy.
+"""
+from comfy_worker.models import flux2, qwen_image, z_image
+
+MODELS = {model.NAME: model for model in (z_image, flux2, qwen_image)}
+
+
+def get_model(name):
+    """Registered model module for name"""
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model '{name}', available: {', '.join(MODELS)}")
@@ -0,0 +1,148 @@
+from comfy_worker.batch import node_id
+
+NAME = "flux2-dev"
+LABEL = "FLUX.2-dev"
+
+# Files under ComfyUI's models dir. The VAE gets its own name so it can sit
+# next to Z-Image's ae.safetensors in a multi-model worker.
+FILES = [
+    {
+        "repo_id": "black-forest-labs/FLUX.2-dev",
+        "filename": "flux2-dev.safetensors",
+        "target_dir": "unet",
+        "target_name": "flux2-dev.safetensors",
+    },
+    {
+        "repo_id": "comfyanonymous/flux_text_encoders",
+        "filename": "t5xxl_fp16.safetensors",
+        "target_dir": "clip",
+        "target_name": "t5xxl_fp16.safetensors",
+    },
+    {
+        "repo_id": "comfyanonymous/flux_text_encoders",
+        "filename": "clip_l.safetensors",
+        "target_dir": "clip",
+        "target_name": "clip_l.safetensors",
+    },
+    {
+        "repo_id": "black-forest-labs/FLUX.2-dev",
+        "filename": "ae.safetensors",
+        "target_dir": "vae",
+        "target_name": "flux2_ae.safetensors",
+    },
+]
+
+DEFAULTS = {
+    "prompt": "a beautiful landscape",
+    "width": 1024,
+    "height": 1024,
+    "steps": 20,
+    "cfg": 3.5,
+}
+
+# Accepted request sizes: sides are snapped to `multiple` (VAE downscale ×
+# patch size) within [min_side, max_side], the area is capped at
+# max_megapixels and steps at max_steps (comfy_worker/schema.py)
+LIMITS = {"multiple": 16, "min_side": 256, "max_side": 2048, "max_megapixels": 4.2, "max_steps": 100}
+
+# Tiny generation run after ComfyUI starts so weights are loaded before the
+# first job; None disables it for this model
+WARMUP = {"width": 256, "height": 256, "steps": 1}
+
+# Response status and the key holding the first image
+RESPONSE = ("completed", "image_data")
+
+
+def build_workflow(items, width, height, steps, cfg, weight_dtype="default"):
+    """FLUX.2-dev workflow (simplified, no negative prompt)
+
+    Loaders and the empty negative are shared, each item gets its own
+    encode/sample/decode branch. Returns the workflow and the SaveImage
+    node id of every branch.
+    """
+    workflow = {
+        "7": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {
+                "text": "",
+                "clip": ["11", 0]
+            }
+        },
+        "10": {
+            "class_type": "VAELoader",
+            "inputs": {
+                "vae_name": "flux2_ae.safetensors"
+            }
+        },
+        "11": {
+            "class_type": "DualCLIPLoader",
+            "inputs": {
+                "clip_name1": "t5xxl_fp16.safetensors",
+                "clip_name2": "clip_l.safetensors",
+                "type": "flux"
+            }
+        },
+        "12": {
+            "class_type": "UNETLoader",
+            "inputs": {
+                "unet_name": "flux2-dev.safetensors",
+                "weight_dtype": weight_dtype
+            }
+        }
+    }
+
+    save_nodes = []
+    encoded = {}
+    for i, item in enumerate(items):
+        # Items with the same prompt share one text encode
+        if item["prompt"] not in encoded:
+            encode_id = node_id("6", len(encoded))
+            workflow[encode_id] = {
+                "class_type": "CLIPTextEncode",
+                "inputs": {
+                    "text": item["prompt"],
+                    "clip": ["11", 0]
+                }
+            }
+            encoded[item["prompt"]] = encode_id
+
+        workflow[node_id("27", i)] = {
+            "class_type": "EmptyLatentImage",
+            "inputs": {
+                "width": width,
+                "height": height,
+                "batch_size": item["batch_size"]
+            }
+        }
+        workflow[node_id("13", i)] = {
+            "class_type": "KSampler",
+            "inputs": {
+                "seed": item["seed"],
+                "steps": steps,
+                "cfg": cfg,
+                "sampler_name": "euler",
+                "scheduler": "simple",
+                "denoise": 1.0,
+                "model": ["12", 0],
+                "positive": [encoded[item["prompt"]], 0],
+                "negative": ["7", 0],
+                "latent_image": [node_id("27", i), 0]
+            }
+        }
+        workflow[node_id("8", i)] = {
+            "class_type": "VAEDecode",
+            "inputs": {
+                "samples": [node_id("13", i), 0],
+                "vae": ["10", 0]
+            }
+        }
+        workflow[node_id("9", i)] = {
+            "class_type": "SaveImage",
+            "inputs": {
+                "filename_prefix": "flux2",
+                "images": [node_id("8", i), 0]
+            }
+        }
+        save_nodes.append(node_id("9", i))
+
+    return workflow, save_nodes
@@ -0,0 +1,123 @@
+from comfy_worker.batch import node_id
+
+NAME = "qwen-image-2512"
+LABEL = "Qwen-Image-2512"
+
+# Files under ComfyUI's models dir
+# Note: Qwen-Image-2512 uses diffusers format, not safetensors
+FILES = [
+    {
+        "repo_id": "Qwen/Qwen-Image-2512",
+        "filename": "model.safetensors",
+        "target_dir": "checkpoints",
+        "target_name": "qwen_image_2512.safetensors",
+    },
+]
+
+# Download failures are logged instead of failing the boot
+EXPERIMENTAL = True
+
+DEFAULTS = {
+    "prompt": "a beautiful landscape",
+    "width": 1024,
+    "height": 1024,
+    "steps": 30,
+    "cfg": 7.0,
+}
+
+# Accepted request sizes: sides are snapped to `multiple` (VAE downscale ×
+# patch size) within [min_side, max_side], the area is capped at
+# max_megapixels and steps at max_steps (comfy_worker/schema.py)
+LIMITS = {"multiple": 16, "min_side": 256, "max_side": 2048, "max_megapixels": 4.2, "max_steps": 100}
+
+# Tiny generation run after ComfyUI starts so weights are loaded before the
+# first job; None disables it for this model
+WARMUP = {"width": 256, "height": 256, "steps": 1}
+
+# Response status and the key holding the first image
+RESPONSE = ("completed", "image_data")
+
+
+def build_workflow(items, width, height, steps, cfg, weight_dtype="default"):
+    """Qwen-Image-2512 workflow
+
+    NOTE: This is a placeholder workflow
+    Qwen-Image-2512 may require custom ComfyUI nodes or diffusers pipeline
+    This workflow assumes standard ComfyUI checkpoint format, whose loader
+    has no weight dtype option, so weight_dtype is not applied
+
+    The checkpoint and negative prompt are shared, each item gets its own
+    encode/sample/decode branch. Returns the workflow and the SaveImage
+    node id of every branch.
+    """
+    workflow = {
+        "4": {
+            "class_type": "CheckpointLoaderSimple",
+            "inputs": {
+                "ckpt_name": "qwen_image_2512.safetensors"
+            }
+        },
+        "7": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {
+                "text": "low quality, blurry, distorted",
+                "clip": ["4", 1]
+            }
+        }
+    }
+
+    save_nodes = []
+    encoded = {}
+    for i, item in enumerate(items):
+        # Items with the same prompt share one text encode
+        if item["prompt"] not in encoded:
+            encode_id = node_id("6", len(encoded))
+            workflow[encode_id] = {
+                "class_type": "CLIPTextEncode",
+                "inputs": {
+                    "text": item["prompt"],
+                    "clip": ["4", 1]
+                }
+            }
+            encoded[item["prompt"]] = encode_id
+
+        workflow[node_id("5", i)] = {
+            "class_type": "EmptyLatentImage",
+            "inputs": {
+                "width": width,
+                "height": height,
+                "batch_size": item["batch_size"]
+            }
+        }
+        workflow[node_id("3", i)] = {
+            "class_type": "KSampler",
+            "inputs": {
+                "seed": item["seed"],
+                "steps": steps,
+                "cfg": cfg,
+                "sampler_name": "euler",
+                "scheduler": "normal",
+                "denoise": 1.0,
+                "model": ["4", 0],
+                "positive": [encoded[item["prompt"]], 0],
+                "negative": ["7", 0],
+                "latent_image": [node_id("5", i), 0]
+            }
+        }
+        workflow[node_id("8", i)] = {
+            "class_type": "VAEDecode",
+            "inputs": {
+                "samples": [node_id("3", i), 0],
+                "vae": ["4", 2]
+            }
+        }
+        workflow[node_id("9", i)] = {
+            "class_type": "SaveImage",
+            "inputs": {
+                "filename_prefix": "qwen_image",
+                "images": [node_id("8", i), 0]
+            }
+        }
+        save_nodes.append(node_id("9", i))
+
+    return workflow, save_nodes
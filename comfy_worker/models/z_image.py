@@ -0,0 +1,146 @@
+from comfy_worker.batch import node_id
+
+NAME = "z-image-turbo"
+LABEL = "Z-Image-Turbo"
+
+# Files under ComfyUI's models dir
+FILES = [
+    {
+        "repo_id": "Comfy-Org/z_image_turbo",
+        "filename": "split_files/diffusion_models/z_image_turbo_bf16.safetensors",
+        "target_dir": "diffusion_models",
+        "target_name": "z_image_turbo_bf16.safetensors",
+    },
+    {
+        "repo_id": "Comfy-Org/z_image_turbo",
+        "filename": "split_files/text_encoders/qwen_3_4b.safetensors",
+        "target_dir": "text_encoders",
+        "target_name": "qwen_3_4b.safetensors",
+    },
+    {
+        "repo_id": "Comfy-Org/z_image_turbo",
+        "filename": "split_files/vae/ae.safetensors",
+        "target_dir": "vae",
+        "target_name": "ae.safetensors",
+    },
+]
+
+DEFAULTS = {
+    "prompt": "a beautiful sunset",
+    "width": 1024,
+    "height": 1024,
+    "steps": 4,
+    "cfg": 1.0,
+}
+
+# Accepted request sizes: sides are snapped to `multiple` (VAE downscale ×
+# patch size) within [min_side, max_side], the area is capped at
+# max_megapixels and steps at max_steps (comfy_worker/schema.py)
+LIMITS = {"multiple": 16, "min_side": 256, "max_side": 2048, "max_megapixels": 4.2, "max_steps": 50}
+
+# Tiny generation run after ComfyUI starts so weights are loaded before the
+# first job; None disables it for this model
+WARMUP = {"width": 256, "height": 256, "steps": 1}
+
+# Response status and the key holding the first image
+RESPONSE = ("success", "image_base64")
+
+
+def build_workflow(items, width, height, steps, cfg, weight_dtype="default"):
+    """Z-Image-Turbo workflow (matches official ComfyUI template)
+
+    Loaders are shared, each item gets its own encode/sample/decode branch.
+    Returns the workflow and the SaveImage node id of every branch.
+    """
+    workflow = {
+        "28": {
+            "class_type": "UNETLoader",
+            "inputs": {
+                "unet_name": "z_image_turbo_bf16.safetensors",
+                "weight_dtype": weight_dtype,
+            },
+        },
+        "11": {
+            "class_type": "ModelSamplingAuraFlow",
+            "inputs": {
+                "model": ["28", 0],
+                "shift": 3,
+            },
+        },
+        "30": {
+            "class_type": "CLIPLoader",
+            "inputs": {
+                "clip_name": "qwen_3_4b.safetensors",
+                "type": "lumina2",
+                "device": "default",
+            },
+        },
+        "29": {
+            "class_type": "VAELoader",
+            "inputs": {"vae_name": "ae.safetensors"},
+        },
+    }
+
+    save_nodes = []
+    encoded = {}
+    for i, item in enumerate(items):
+        # Items with the same prompt share one text encode
+        if item["prompt"] not in encoded:
+            encode_id = node_id("27", len(encoded))
+            zero_id = node_id("33", len(encoded))
+            workflow[encode_id] = {
+                "class_type": "CLIPTextEncode",
+                "inputs": {
+                    "clip": ["30", 0],
+                    "text": item["prompt"],
+                },
+            }
+            workflow[zero_id] = {
+                "class_type": "ConditioningZeroOut",
+                "inputs": {
+                    "conditioning": [encode_id, 0],
+                },
+            }
+            encoded[item["prompt"]] = (encode_id, zero_id)
+        encode_id, zero_id = encoded[item["prompt"]]
+
+        workflow[node_id("13", i)] = {
+            "class_type": "EmptySD3LatentImage",
+            "inputs": {
+                "width": width,
+                "height": height,
+                "batch_size": item["batch_size"],
+            },
+        }
+        workflow[node_id("3", i)] = {
+            "class_type": "KSampler",
+            "inputs": {
+                "model": ["11", 0],
+                "positive": [encode_id, 0],
+                "negative": [zero_id, 0],
+                "latent_image": [node_id("13", i), 0],
+                "seed": item["seed"],
+                "steps": steps,
+                "cfg": cfg,
+                "sampler_name": "res_multistep",
+                "scheduler": "simple",
+                "denoise": 1.0,
+            },
+        }
+        workflow[node_id("8", i)] = {
+            "class_type": "VAEDecode",
+            "inputs": {
+                "samples": [node_id("3", i), 0],
+                "vae": ["29", 0],
+            },
+        }
+        workflow[node_id("9", i)] = {
+            "class_type": "SaveImage",
+            "inputs": {
+                "filename_prefix": "z_image",
+                "images": [node_id("8", i), 0],
+            },
+        }
+        save_nodes.append(node_id("9", i))
+
+    return workflow, save_nodes
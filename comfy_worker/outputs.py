@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+# "websocket" swaps the workflows' SaveImage nodes for SaveImageWebsocket
+# (shipped in ComfyUI's custom_nodes): images come back over the /ws socket
+# and never touch the disk. "file" keeps SaveImage and reads the files back
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "websocket")
+
+# Files in ComfyUI's output/temp dirs older than this many seconds are
+# deleted by the janitor, which looks every JANITOR_INTERVAL seconds
+OUTPUT_MAX_AGE = int(os.getenv("OUTPUT_MAX_AGE", "600"))
+JANITOR_INTERVAL = 60
+
+WEBSOCKET_SAVE = "SaveImageWebsocket"
+
+
+def output_workflow(workflow, mode=OUTPUT_MODE):
+    """The workflow to submit: SaveImage nodes become SaveImageWebsocket in websocket mode
+
+    Node ids stay the same, so the save nodes a model returned still find
+    their images in the outputs.
+    """
+    if mode != "websocket":
+        return workflow
+    converted = {}
+    for nid, node in workflow.items():
+        if node.get("class_type") == "SaveImage":
+            node = {"class_type": WEBSOCKET_SAVE, "inputs": {"images": node["inputs"]["images"]}}
+        converted[nid] = node
+    return converted
+
+
+def websocket_nodes(workflow):
+    """Ids of the nodes sending their images over the socket"""
+    return [nid for nid, node in workflow.items() if node.get("class_type") == WEBSOCKET_SAVE]
+
+
+def remove_output(output_dir, img_info):
+    """Delete an output file once it has been read (no-op for websocket images)"""
+    if "data" in img_info or not img_info.get("filename"):
+        return
+    try:
+        os.remove(os.path.join(output_dir, img_info.get("subfolder", ""), img_info["filename"]))
+    except OSError:
+        pass
+
+
+class Janitor:
+    """Deletes files nobody is going to read from ComfyUI's output/temp dirs
+
+    Results are removed as soon as a job has read them; this catches what
+    failed or abandoned jobs, warm-ups and preview nodes leave behind.
+    """
+
+    def __init__(self, dirs, max_age=OUTPUT_MAX_AGE, interval=JANITOR_INTERVAL):
+        self.dirs = list(dirs)
+        self.max_age = max_age
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        """Start sweeping in the background (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="output-janitor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                removed = self.sweep()
+            except Exception as e:
+                print(f"⚠️ Output cleanup failed: {e}")
+                continue
+            if removed:
+                print(f"🧹 Removed {removed} stale output files")
+
+    def sweep(self):
+        """Delete files older than max_age, returns how many"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for base in self.dirs:
+            for root, _, files in os.walk(base):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        if os.stat(path).st_mtime < cutoff:
+                            os.remove(path)
+                            removed += 1
+                    except OSError:
+                        pass
+        return removed
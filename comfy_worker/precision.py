@@ -0,0 +1,203 @@
+import json
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from comfy_worker.locks import FileLock
+
+# Weight dtype the diffusion model (UNETLoader) is loaded with: "default"
+# (the file's own, bf16), "fp8_e4m3fn" or "fp8_e5m2". "auto" picks
+# fp8_e4m3fn for weights taking more than FP8_VRAM_SHARE of the GPU's VRAM
+# (/system_stats), else default. Requests can override it with `precision`
+PRECISION = os.getenv("PRECISION", "auto")
+PRECISIONS = ("auto", "default", "fp8_e4m3fn", "fp8_e5m2")
+FP8_VRAM_SHARE = float(os.getenv("FP8_VRAM_SHARE", "0.6"))
+
+# Model dirs UNETLoader reads diffusion models from (ComfyUI maps both to
+# its "diffusion_models" folder)
+UNET_DIRS = ("unet", "diffusion_models")
+
+# safetensors dtype of each fp8 weight_dtype
+FP8_DTYPES = {"fp8_e4m3fn": "F8_E4M3", "fp8_e5m2": "F8_E5M2"}
+_DTYPE_BYTES = {
+    "F64": 8,
+    "F32": 4,
+    "F16": 2,
+    "BF16": 2,
+    "I64": 8,
+    "I32": 4,
+    "I16": 2,
+    "I8": 1,
+    "U8": 1,
+    "BOOL": 1,
+    "F8_E4M3": 1,
+    "F8_E5M2": 1,
+}
+
+
+def parse_precision(input_data, default=PRECISION):
+    """The request's precision policy, the worker's if it has none"""
+    precision = input_data.get("precision") or default
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}, got {precision!r}")
+    return precision
+
+
+def choose(weights_bytes, vram_total, share=FP8_VRAM_SHARE):
+    """What "auto" means for weights of weights_bytes on a GPU with vram_total bytes (None: unknown)"""
+    if vram_total and weights_bytes > vram_total * share:
+        return "fp8_e4m3fn"
+    return "default"
+
+
+def quantized_name(unet_name, dtype):
+    """File name of unet_name's dtype copy"""
+    stem, ext = os.path.splitext(unet_name)
+    return f"{stem}.{dtype}{ext}"
+
+
+def quantize_file(source, target, dtype):
+    """Write source's weights to target with the matrix/conv weights cast to dtype
+
+    Streams one tensor at a time, so it needs the RAM of the largest tensor,
+    not of the model. Biases, norms and other 1-d tensors keep their dtype;
+    ComfyUI casts whatever else it wants to at load, as it would have for
+    the original file.
+    """
+    import torch
+    from safetensors import safe_open
+
+    torch_dtype = {"fp8_e4m3fn": torch.float8_e4m3fn, "fp8_e5m2": torch.float8_e5m2}[dtype]
+    with safe_open(str(source), framework="pt") as f:
+        header, plan, offset = {}, [], 0
+        for key in f.keys():
+            tensor_slice = f.get_slice(key)
+            shape = tensor_slice.get_shape()
+            stored = tensor_slice.get_dtype()
+            cast = key.endswith(".weight") and len(shape) >= 2 and stored in ("BF16", "F16", "F32")
+            out_dtype = FP8_DTYPES[dtype] if cast else stored
+            size = _DTYPE_BYTES[out_dtype]
+            for dim in shape:
+                size *= dim
+            header[key] = {"dtype": out_dtype, "shape": shape, "data_offsets": [offset, offset + size]}
+            plan.append((key, cast))
+            offset += size
+        if f.metadata():
+            header["__metadata__"] = f.metadata()
+
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        encoded += b" " * (-len(encoded) % 8)
+        with open(target, "wb") as out:
+            out.write(struct.pack("<Q", len(encoded)))
+            out.write(encoded)
+            for key, cast in plan:
+                tensor = f.get_tensor(key)
+                if cast:
+                    tensor = tensor.to(torch_dtype)
+                out.write(tensor.contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+
+
+class QuantizedWeights:
+    """fp8 copies of diffusion model files, converted once and reused on later cold starts
+
+    ComfyUI quantizes an fp8 weight_dtype at load time, after reading the
+    full-width file. The copy (<name>.<dtype>.safetensors) is half the size
+    and loads as is. It is written next to the original, so in the model
+    store every worker sharing it reuses one copy, and linked into the
+    ComfyUI models dir (UNET_DIRS) the original is in. Until it exists
+    prompts load the original and ComfyUI quantizes.
+    """
+
+    def __init__(self, models_dir, store):
+        self.unet_dirs = [Path(models_dir) / name for name in UNET_DIRS]
+        self.store = store
+        self._scheduled = set()
+        self._lock = threading.Lock()
+
+    def unet_dir(self, unet_name):
+        """The UNET_DIRS dir holding unet_name, the first one if none does"""
+        for unet_dir in self.unet_dirs:
+            if (unet_dir / unet_name).exists():
+                return unet_dir
+        return self.unet_dirs[0]
+
+    def ready(self, unet_name, dtype):
+        return (self.unet_dir(unet_name) / quantized_name(unet_name, dtype)).exists()
+
+    def size(self, unet_name):
+        """Bytes of the original weights, 0 if they aren't there"""
+        try:
+            return os.path.getsize(self.unet_dir(unet_name) / unet_name)
+        except OSError:
+            return 0
+
+    def ensure(self, unet_name, dtype):
+        """Convert unet_name to dtype unless that's done already (blocking), False without the original"""
+        unet_dir = self.unet_dir(unet_name)
+        target = unet_dir / quantized_name(unet_name, dtype)
+        if target.exists():
+            return True
+        source = (unet_dir / unet_name).resolve()
+        if not source.exists():
+            print(f"⚠️ {unet_name} not found in {', '.join(UNET_DIRS)}, can't convert it to {dtype}")
+            return False
+
+        copy = source.with_name(quantized_name(source.name, dtype))
+        # One worker converts, the others sharing the store wait and reuse it
+        with FileLock(copy.with_name(f".{copy.name}.lock")):
+            if not copy.exists():
+                print(f"🗜️ Converting {unet_name} to {dtype}...")
+                started = time.time()
+                tmp = copy.with_name(f".{copy.name}.{os.getpid()}.tmp")
+                try:
+                    quantize_file(source, tmp, dtype)
+                    os.replace(tmp, copy)
+                except BaseException:
+                    tmp.unlink(missing_ok=True)
+                    raise
+                print(f"🗜️ {copy.name} written in {time.time() - started:.1f}s")
+        if copy != target:
+            self.store.link(
+                {"target_dir": str(target.parent), "target_name": target.name},
+                {"target_dir": str(copy.parent), "target_name": copy.name},
+            )
+        return True
+
+    def schedule(self, unet_name, dtype):
+        """Convert in the background, for the prompts after this one (once per process)"""
+        with self._lock:
+            if (unet_name, dtype) in self._scheduled:
+                return
+            self._scheduled.add((unet_name, dtype))
+
+        def run():
+            try:
+                self.ensure(unet_name, dtype)
+            except Exception as e:
+                print(f"⚠️ Could not convert {unet_name} to {dtype}: {e}")
+
+        threading.Thread(target=run, name=f"quantize-{unet_name}", daemon=True).start()
+
+    def resolve(self, workflow, vram_total, convert=True):
+        """The workflow to submit: UNETLoader weight_dtype resolved, loading fp8 copies where they exist
+
+        Missing copies are scheduled for conversion unless convert is False.
+        """
+        converted = {}
+        for nid, node in workflow.items():
+            if node.get("class_type") == "UNETLoader":
+                inputs = node["inputs"]
+                name = inputs["unet_name"]
+                dtype = inputs.get("weight_dtype", "default")
+                if dtype == "auto":
+                    dtype = choose(self.size(name), vram_total)
+                if dtype in FP8_DTYPES:
+                    if self.ready(name, dtype):
+                        name = quantized_name(name, dtype)
+                    elif convert:
+                        self.schedule(name, dtype)
+                node = {"class_type": "UNETLoader", "inputs": dict(inputs, unet_name=name, weight_dtype=dtype)}
+            converted[nid] = node
+        return converted
@@ -0,0 +1,74 @@
+import base64
+import os
+import threading
+import time
+
+import runpod
+
+# ComfyUI's --preview-method: "none" (no previews), "latent2rgb" (cheap,
+# low-res), "taesd" or "auto"
+PREVIEW_METHOD = os.getenv("PREVIEW_METHOD", "none")
+
+# Minimum seconds between two progress_update calls for one job (each is an
+# HTTP request to RunPod); the last step is always sent
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.5"))
+
+
+def progress_output(update):
+    """A listener update as sent to the caller"""
+    if update["type"] == "preview":
+        return {
+            "status": "preview",
+            "format": update["format"],
+            "image": base64.b64encode(update["data"]).decode("utf-8"),
+        }
+    step, steps = update.get("step") or 0, update.get("steps") or 0
+    return {
+        "status": "progress",
+        "step": step,
+        "steps": steps,
+        "progress": round(step / steps, 3) if steps else None,
+        "node": update.get("node"),
+    }
+
+
+def wants_previews(input_data):
+    return bool(input_data.get("previews")) and PREVIEW_METHOD != "none"
+
+
+def fan_out(callbacks):
+    """One callback calling all of callbacks, None if there are none"""
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if not callbacks:
+        return None
+
+    def notify(update):
+        for callback in callbacks:
+            callback(update)
+    return notify
+
+
+class ProgressUpdater:
+    """Listener callback forwarding a job's progress through runpod progress_update
+
+    Throttled to PROGRESS_INTERVAL so a 20-step run doesn't turn into 20
+    requests; previews only when the job asked for them.
+    """
+
+    def __init__(self, event, previews=False, interval=PROGRESS_INTERVAL):
+        self.event = event
+        self.previews = previews
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, update):
+        if update["type"] == "preview" and not self.previews:
+            return
+        final = update["type"] == "progress" and update.get("step") == update.get("steps")
+        with self._lock:
+            now = time.monotonic()
+            if not final and now - self._last < self.interval:
+                return
+            self._last = now
+        runpod.serverless.progress_update(self.event, progress_output(update))
@@ -0,0 +1,71 @@
+import os
+import threading
+from collections import OrderedDict
+
+# VRAM the resident models may take up together; 0 uses VRAM_BUDGET_FRACTION
+# of the GPU's total as reported by /system_stats
+VRAM_BUDGET_GB = float(os.getenv("VRAM_BUDGET_GB", "0"))
+VRAM_BUDGET_FRACTION = 0.9
+
+
+class ResidentModels:
+    """LRU of the models ComfyUI holds in VRAM, kept within a budget
+
+    ComfyUI loads weights on the first prompt that needs them and keeps them
+    around. Before a prompt for a model that doesn't fit next to the resident
+    ones, the cold models are evicted with /free. ComfyUI can't unload a
+    single model through the API, so an eviction unloads all of them and the
+    requested model starts a fresh LRU. That would also unload the models of
+    prompts still queued, which then load them right back, so a busy server
+    is left to ComfyUI's own memory management.
+    """
+
+    def __init__(self, client, budget_gb=VRAM_BUDGET_GB):
+        self.client = client
+        self._budget = int(budget_gb * 1024**3) or None
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+
+    def budget(self):
+        """Budget in bytes, 0 if unknown (never evict)"""
+        if self._budget is None:
+            devices = self.client.system_stats().get("devices") or []
+            total = devices[0].get("vram_total", 0) if devices else 0
+            self._budget = int(total * VRAM_BUDGET_FRACTION)
+        return self._budget
+
+    def acquire(self, name, size, busy=None):
+        """Mark name (size bytes) as used by the next prompt, evicting if it doesn't fit
+
+        busy() (asked only when something would be evicted) tells whether
+        other prompts are queued on the server or about to be: then their
+        models stay and name is only added.
+        """
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return
+
+            used = sum(self._resident.values())
+            if self._resident and self.budget() and used + size > self.budget():
+                if busy is not None and busy():
+                    print(f"♻️ {name} doesn't fit next to {', '.join(self._resident)}, not evicting while busy")
+                    self._resident[name] = size
+                    return
+                print(
+                    f"♻️ Freeing VRAM for {name} ({size / 1024**3:.1f} GB): "
+                    f"evicting {', '.join(self._resident)} ({used / 1024**3:.1f} GB)"
+                )
+                self.client.free(unload_models=True, free_memory=True)
+                self._resident.clear()
+            self._resident[name] = size
+
+    def clear(self):
+        """Forget everything, e.g. after ComfyUI restarted"""
+        with self._lock:
+            self._resident.clear()
+
+    def resident(self):
+        """Resident model names, least recently used first"""
+        with self._lock:
+            return list(self._resident)
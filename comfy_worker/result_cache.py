@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def _default_dir():
+    # Prefer the network volume so every worker on the endpoint shares hits
+    if os.path.isdir("/runpod-volume"):
+        return "/runpod-volume/result-cache"
+    return "/root/.cache/result-cache"
+
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR") or _default_dir()
+
+# Size bound for the cache; 0 disables it
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "2048"))
+
+
+def has_explicit_seed(input_data):
+    """Only seeded requests are reproducible, random seeds bypass the cache"""
+    return input_data.get("seed") is not None or bool(input_data.get("seeds"))
+
+
+class ResultCache:
+    """Content-addressed, size-bounded LRU of raw ComfyUI outputs on disk
+
+    Keyed on the full workflow (model files, prompts, seeds, size, steps,
+    cfg, sampler...), so a hit is exactly what ComfyUI would have produced.
+    Entries are directories of numbered images; the directory mtime is the
+    LRU clock, which also works when several workers share a volume.
+    """
+
+    def __init__(self, namespace, root=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MB * 1024 * 1024):
+        self.namespace = namespace
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="result-cache")
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, workflow, input_data):
+        """Cache key for a job, or None if it must bypass the cache"""
+        if not self.enabled or not has_explicit_seed(input_data):
+            return None
+        canonical = json.dumps({"namespace": self.namespace, "workflow": workflow}, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _entry(self, key):
+        return self.root / key[:2] / key
+
+    def get(self, key):
+        """List of image bytes for key, or None on a miss"""
+        entry = self._entry(key)
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            images = [(entry / f"{i}.png").read_bytes() for i in range(meta["count"])]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return images
+
+    def put(self, key, images):
+        """Store images for key in the background"""
+        images = [bytes(data) for data in images]
+        return self._writer.submit(self._put, key, images)
+
+    def _put(self, key, images):
+        entry = self._entry(key)
+        if entry.exists():
+            return
+        tmp = entry.parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp.mkdir(parents=True)
+        try:
+            for i, data in enumerate(images):
+                (tmp / f"{i}.png").write_bytes(data)
+            (tmp / "meta.json").write_text(json.dumps({"count": len(images), "created": time.time()}))
+            os.rename(tmp, entry)
+        except OSError:
+            # Another worker on the shared volume stored it first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        with self._lock:
+            if self._size is not None:
+                self._size += sum(len(data) for data in images)
+            if self._size is None or self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for entry in self.root.glob("*/*"):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except OSError:
+                continue
+            total += size
+
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, entry = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        self._size = total
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+
+from comfy_worker.batch import MAX_IMAGES
+from comfy_worker.progress import fan_out
+
+# How long a job may be held to be coalesced with compatible ones while
+# ComfyUI is busy; 0 submits every job on its own
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "0"))
+
+# "1" queues prompts into ComfyUI shortest job first: ComfyUI runs the
+# lowest `number` first and ours is arrival time + cost × SECONDS_PER_MP_STEP,
+# so a cheap job overtakes an expensive one queued at most that much earlier
+# and nothing waits forever. "0" keeps arrival order
+SHORTEST_JOB_FIRST = os.getenv("SHORTEST_JOB_FIRST", "1") == "1"
+SECONDS_PER_MP_STEP = float(os.getenv("SECONDS_PER_MP_STEP", "0.1"))
+
+
+def queue_priority(cost, arrival=None, enabled=SHORTEST_JOB_FIRST):
+    """ComfyUI queue `number` for a job of cost megapixel-steps, None for arrival order"""
+    if not enabled:
+        return None
+    if arrival is None:
+        arrival = time.monotonic()
+    return arrival + cost * SECONDS_PER_MP_STEP
+
+
+def batch_key(job):
+    """Jobs with the same key can share one workflow: same model and sampling settings"""
+    return (job["model"].NAME, tuple(sorted(job["params"].items())))
+
+
+class _Group:
+    def __init__(self, key):
+        self.key = key
+        self.jobs = []
+        self.futures = []
+        self.arrivals = []
+        self.images = 0
+        self.timer = None
+
+
+class MicroBatcher:
+    """Coalesces compatible concurrent jobs into one ComfyUI prompt
+
+    While fewer of our prompts are running than there are ComfyUI instances
+    (`capacity`), a job is submitted right away, so a lone request pays no
+    extra latency. While they are all busy, jobs with the same batch_key are
+    held for up to `window` seconds and submitted as one workflow: each
+    job's items become their own sampler branches (own prompt and seed) and
+    shared loaders/encodes run once. When the prompt finishes every job gets
+    its own SaveImage nodes back.
+
+    `execute(model, workflow, on_progress, timeout, priority)` is a
+    coroutine that queues the workflow (at ComfyUI queue number priority)
+    and waits for it up to timeout seconds, returning a dict with at least
+    "outputs". A batch gets the longest timeout and the earliest priority of
+    its jobs; jobs cancelled while held are dropped from their batch.
+    Runs on one event loop.
+    """
+
+    def __init__(self, execute, window=BATCH_WINDOW_MS / 1000, max_images=MAX_IMAGES, capacity=1):
+        self.execute = execute
+        self.window = window
+        self.max_images = max_images
+        self.capacity = capacity
+        self.running = 0
+        self._groups = {}
+        self._tasks = set()
+
+    async def run(self, job):
+        """Generate a prepared job, possibly batched with others
+
+        Returns execute()'s result with this job's "save_nodes", plus "held"
+        (seconds waited for the batch) and "batch_jobs".
+        """
+        images = sum(item["batch_size"] for item in job["items"])
+        if self.running < self.capacity and not self._groups:
+            return (await self._run_batch([job]))[0]
+
+        key = batch_key(job)
+        group = self._groups.get(key)
+        if group is not None and group.images + images > self.max_images:
+            self._flush(key)
+            group = None
+        if group is None:
+            group = _Group(key)
+            group.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+            self._groups[key] = group
+
+        future = asyncio.get_running_loop().create_future()
+        group.jobs.append(job)
+        group.futures.append(future)
+        group.arrivals.append(time.perf_counter())
+        group.images += images
+        if group.images >= self.max_images:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        group.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._run_group(group))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_group(self, group):
+        flushed = time.perf_counter()
+        # Cancelled (e.g. by RunPod) while they were held
+        live = [i for i, future in enumerate(group.futures) if not future.done()]
+        if not live:
+            return
+        group.jobs = [group.jobs[i] for i in live]
+        group.futures = [group.futures[i] for i in live]
+        group.arrivals = [group.arrivals[i] for i in live]
+        try:
+            results = await self._run_batch(group.jobs)
+        except Exception as e:
+            for future in group.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, arrival, result in zip(group.futures, group.arrivals, results):
+            if not future.done():
+                future.set_result(dict(result, held=flushed - arrival))
+
+    async def _run_batch(self, jobs):
+        self.running += 1
+        try:
+            if len(jobs) == 1:
+                job = jobs[0]
+                result = await self.execute(
+                    job["model"], job["workflow"], job.get("on_progress"), job.get("timeout"), job.get("priority")
+                )
+                return [dict(result, save_nodes=job["save_nodes"], held=0.0, batch_jobs=1)]
+
+            model = jobs[0]["model"]
+            items = [item for job in jobs for item in job["items"]]
+            workflow, save_nodes = model.build_workflow(items, **jobs[0]["params"])
+            print(f"📦 Batching {len(jobs)} jobs ({len(items)} branches) into one prompt")
+            # Every job in the batch follows the shared prompt's progress
+            timeouts = [job["timeout"] for job in jobs if job.get("timeout") is not None]
+            priorities = [job["priority"] for job in jobs if job.get("priority") is not None]
+            result = await self.execute(
+                model,
+                workflow,
+                fan_out(job.get("on_progress") for job in jobs),
+                max(timeouts, default=None),
+                min(priorities, default=None),
+            )
+
+            # build_workflow returns one SaveImage node per item, in order
+            results = []
+            start = 0
+            for job in jobs:
+                end = start + len(job["items"])
+                results.append(dict(result, save_nodes=save_nodes[start:end], batch_jobs=len(jobs)))
+                start = end
+            return results
+        finally:
+            self.running -= 1
+            if self.running < self.capacity:
+                # An instance is idle, nothing to gain from holding jobs any longer
+                for key in list(self._groups):
+                    self._flush(key)
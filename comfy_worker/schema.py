@@ -0,0 +1,91 @@
+import math
+import os
+
+# Most a job may cost, in megapixel-steps (width × height / 1e6 × steps ×
+# images); 0 disables the check. Jobs over it are rejected, or with
+# OVER_BUDGET=downgrade run with fewer steps and, if that's not enough, a
+# smaller size
+JOB_COST_BUDGET = float(os.getenv("JOB_COST_BUDGET", "400"))
+OVER_BUDGET = os.getenv("OVER_BUDGET", "reject")
+
+
+def number(input_data, keys, default, cast):
+    """First of keys that is set, falling back to default for missing/zero values"""
+    for key in keys:
+        value = input_data.get(key)
+        if value is not None:
+            try:
+                return cast(float(value or default))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"{key} must be a number, got {value!r}")
+    return cast(default)
+
+
+def job_cost(params, images):
+    """Megapixel-steps of a job: what its generation time scales with"""
+    return params["width"] * params["height"] / 1e6 * params["steps"] * images
+
+
+def _snap(value, multiple, low, high):
+    # Nearest multiple within [low, high] (limits are multiples themselves)
+    return min(max(round(value / multiple) * multiple, low), high)
+
+
+def _shrink(params, factor, limits):
+    # Scale both sides by factor, rounding down to the multiple
+    multiple = limits["multiple"]
+    for side in ("width", "height"):
+        scaled = math.floor(params[side] * factor / multiple) * multiple
+        params[side] = max(scaled, limits["min_side"])
+
+
+def normalize(model, input_data, images, budget=JOB_COST_BUDGET, over_budget=OVER_BUDGET):
+    """Validated generation settings of a request, returns (params, cost, adjusted)
+
+    params has width, height, steps and cfg within model.LIMITS, adjusted
+    maps every setting that was changed to {"requested", "used"}. Raises
+    ValueError for invalid values and, unless over_budget is "downgrade",
+    for jobs costing more than budget.
+    """
+    defaults = model.DEFAULTS
+    limits = model.LIMITS
+    requested = {
+        "width": number(input_data, ("width",), defaults["width"], int),
+        "height": number(input_data, ("height",), defaults["height"], int),
+        "steps": number(input_data, ("steps", "num_inference_steps"), defaults["steps"], int),
+        "cfg": number(input_data, ("cfg", "guidance_scale"), defaults["cfg"], float),
+    }
+    if requested["cfg"] < 0 or not math.isfinite(requested["cfg"]):
+        raise ValueError(f"cfg must be a non-negative number, got {requested['cfg']}")
+
+    params = dict(requested)
+    for side in ("width", "height"):
+        params[side] = _snap(params[side], limits["multiple"], limits["min_side"], limits["max_side"])
+    megapixels = params["width"] * params["height"] / 1e6
+    if megapixels > limits["max_megapixels"]:
+        _shrink(params, math.sqrt(limits["max_megapixels"] / megapixels), limits)
+    params["steps"] = min(max(params["steps"], 1), limits["max_steps"])
+
+    cost = job_cost(params, images)
+    if budget and cost > budget:
+        if over_budget != "downgrade":
+            raise ValueError(
+                f"Job too expensive: {cost:.0f} megapixel-steps (width × height × steps × images), "
+                f"the budget is {budget:.0f}; lower the size, steps or number of images"
+            )
+        # Fewer steps first, but not below the model's default, then a smaller image
+        floor = min(params["steps"], defaults["steps"])
+        params["steps"] = max(floor, int(params["steps"] * budget / cost))
+        cost = job_cost(params, images)
+        if cost > budget:
+            _shrink(params, math.sqrt(budget / cost), limits)
+            cost = job_cost(params, images)
+        if cost > budget:
+            raise ValueError(
+                f"Job too expensive even downgraded: {cost:.0f} megapixel-steps, the budget is {budget:.0f}"
+            )
+
+    adjusted = {
+        key: {"requested": requested[key], "used": params[key]} for key in params if params[key] != requested[key]
+    }
+    return params, cost, adjusted
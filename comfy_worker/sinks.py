@@ -0,0 +1,171 @@
+import base64
+import io
+import os
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Where results go by default: "inline" (base64 in the response) or "s3"
+OUTPUT_SINK = os.getenv("OUTPUT_SINK", "inline")
+
+# S3-compatible storage (AWS, R2, MinIO, ...)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PREFIX = os.getenv("S3_PREFIX", "outputs/")
+# Seconds a presigned URL stays valid; 0 returns plain object URLs instead
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+# Optional public/CDN base for plain URLs, e.g. https://cdn.example.com
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "").rstrip("/")
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+
+CONTENT_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+_upload_pool = ThreadPoolExecutor(UPLOAD_WORKERS, thread_name_prefix="upload")
+
+
+def _then(future, fn, executor=None):
+    """Future of fn(future.result()), run inline or on executor once future is done"""
+    chained = Future()
+
+    def run(result):
+        try:
+            chained.set_result(fn(result))
+        except Exception as e:
+            chained.set_exception(e)
+
+    def on_done(done):
+        try:
+            result = done.result()
+        except Exception as e:
+            chained.set_exception(e)
+            return
+        if executor is None:
+            run(result)
+        else:
+            executor.submit(run, result)
+
+    future.add_done_callback(on_done)
+    return chained
+
+
+class InlineSink:
+    """Results as base64 strings in the RunPod response (the original behaviour)"""
+
+    name = "inline"
+
+    def submit(self, encoded_future, key):
+        return _then(encoded_future, self.store)
+
+    def store(self, encoded, key=None):
+        stored = _metadata(encoded)
+        stored["base64"] = base64.b64encode(encoded["data"]).decode("utf-8")
+        if "thumbnail" in encoded:
+            stored["thumbnail"] = {"base64": base64.b64encode(encoded["thumbnail"]["data"]).decode("utf-8")}
+        return stored
+
+
+class S3Sink:
+    """Results uploaded to an S3-compatible bucket, returned as (presigned) URLs
+
+    Uploads run on their own pool, so they overlap encoding of the other
+    images and, with MAX_CONCURRENCY above 1, the next job's generation.
+    Large files go up as parallel multipart uploads.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket=S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION, prefix=S3_PREFIX):
+        if not bucket:
+            raise RuntimeError("S3 output requested but S3_BUCKET is not set")
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("S3 output requires boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.prefix = prefix
+        self.s3 = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=8 * 1024 * 1024,
+            max_concurrency=4,
+        )
+
+    def submit(self, encoded_future, key):
+        return _then(encoded_future, lambda encoded: self.store(encoded, key), executor=_upload_pool)
+
+    def store(self, encoded, key):
+        stored = _metadata(encoded)
+        stored.update(self._upload(encoded, key))
+        if "thumbnail" in encoded:
+            stored["thumbnail"] = self._upload(encoded["thumbnail"], f"{key}_thumb")
+        return stored
+
+    def _upload(self, encoded, key):
+        key = f"{self.prefix}{key}.{EXTENSIONS[encoded['format']]}"
+        self.s3.upload_fileobj(
+            io.BytesIO(encoded["data"]),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": CONTENT_TYPES[encoded["format"]]},
+            Config=self.transfer_config,
+        )
+        return {"key": key, "url": self.url(key)}
+
+    def url(self, key):
+        if S3_PRESIGN_EXPIRES > 0:
+            return self.s3.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=S3_PRESIGN_EXPIRES,
+            )
+        if S3_PUBLIC_URL:
+            return f"{S3_PUBLIC_URL}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+
+def _metadata(encoded):
+    return {key: encoded[key] for key in ("format", "bytes", "width", "height")}
+
+
+_sinks = {}
+
+
+def get_sink(input_data):
+    """Sink for a job: input output_sink, else OUTPUT_SINK"""
+    name = str(input_data.get("output_sink") or OUTPUT_SINK).lower()
+    if name not in ("inline", "s3"):
+        raise ValueError("output_sink must be 'inline' or 's3'")
+    if name not in _sinks:
+        _sinks[name] = S3Sink() if name == "s3" else InlineSink()
+    return _sinks[name]
+
+
+def job_key(event):
+    """Object key prefix for a job's results"""
+    return str(event.get("id") or uuid.uuid4().hex)
+
+
+def response_fields(results):
+    """Response keys for a list of stored results"""
+    fields = {
+        "image_info": [
+            {key: r[key] for key in ("format", "bytes", "width", "height", "key") if key in r}
+            for r in results
+        ],
+    }
+    if all("base64" in r for r in results):
+        fields["images"] = [r["base64"] for r in results]
+        if any("thumbnail" in r for r in results):
+            fields["thumbnails"] = [r["thumbnail"]["base64"] for r in results if "thumbnail" in r]
+    else:
+        fields["image_urls"] = [r["url"] for r in results]
+        if any("thumbnail" in r for r in results):
+            fields["thumbnail_urls"] = [r["thumbnail"]["url"] for r in results if "thumbnail" in r]
+    return fields
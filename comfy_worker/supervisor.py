@@ -0,0 +1,166 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+# ComfyUI log lines kept in memory per server
+COMFYUI_LOG_LINES = int(os.getenv("COMFYUI_LOG_LINES", "1000"))
+# Lines of it included in error responses
+ERROR_LOG_LINES = int(os.getenv("ERROR_LOG_LINES", "40"))
+
+# A server that fails HEALTH_FAILURES /system_stats checks in a row,
+# HEALTH_INTERVAL seconds apart, is considered hung and restarted
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "10"))
+HEALTH_FAILURES = int(os.getenv("HEALTH_FAILURES", "6"))
+HEALTH_TIMEOUT = 5
+
+
+class ComfyUICrashed(RuntimeError):
+    """ComfyUI died or hung while a prompt was in flight"""
+
+
+class LogBuffer:
+    """Drains a process' output on a background thread into a ring buffer
+
+    Nothing ever blocks on a full pipe, the lines are echoed to our stdout
+    and the last `lines` of them stay around for error responses.
+    """
+
+    def __init__(self, lines=COMFYUI_LOG_LINES, prefix=""):
+        self.prefix = prefix
+        self._lines = deque(maxlen=lines)
+        self._lock = threading.Lock()
+
+    def drain(self, stream, on_close=None):
+        """Read stream to EOF on a daemon thread, then call on_close()"""
+        def run():
+            try:
+                for raw in iter(stream.readline, b""):
+                    line = raw.decode("utf-8", errors="replace").rstrip("\n")
+                    with self._lock:
+                        self._lines.append(line)
+                    sys.stdout.write(f"{self.prefix}{line}\n")
+                    sys.stdout.flush()
+            except (OSError, ValueError):
+                pass
+            finally:
+                stream.close()
+                if on_close is not None:
+                    on_close()
+
+        threading.Thread(target=run, name="comfyui-log", daemon=True).start()
+
+    def tail(self, lines=ERROR_LOG_LINES):
+        with self._lock:
+            return "\n".join(list(self._lines)[-lines:])
+
+
+class Supervisor:
+    """Keeps one ComfyUI instance alive
+
+    The process exiting is noticed right away (its log pipe closes), a hung
+    server after HEALTH_FAILURES failed /system_stats checks. Those only
+    count once a launch has answered, or has had `startup` seconds to, so a
+    slow cold start isn't mistaken for a hang. Either way it
+    is (killed and) relaunched; launching fails the prompts that were in
+    flight with ComfyUICrashed so callers can resubmit them.
+    """
+
+    def __init__(self, instance, interval=HEALTH_INTERVAL, failures=HEALTH_FAILURES, startup=120):
+        self.instance = instance
+        self.interval = interval
+        self.failures = failures
+        self.startup = startup
+        self.restarts = 0
+        self._wake = threading.Event()
+        self._recovering = threading.Event()
+        self._recover_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start watching (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"supervisor-{self.instance.name}", daemon=True)
+            self._thread.start()
+
+    def process_exited(self):
+        self._wake.set()
+
+    def _run(self):
+        failures = 0
+        watched, launched, answered = None, 0.0, False
+        while True:
+            woken = self._wake.wait(self.interval)
+            self._wake.clear()
+            process = self.instance.process
+            if process is None:
+                continue
+            if process is not watched:
+                # A new launch, still starting up until it first answers
+                watched, launched, answered = process, time.monotonic(), False
+                failures = 0
+
+            if woken:
+                # The log pipe closes a moment before the exit status is there
+                try:
+                    process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    pass
+            if process.poll() is not None:
+                self.recover(f"exited with code {process.returncode}", process)
+                failures = 0
+                continue
+            try:
+                self.instance.client.system_stats(timeout=HEALTH_TIMEOUT)
+                failures = 0
+                answered = True
+            except Exception:
+                if not answered and time.monotonic() - launched < self.startup:
+                    continue
+                failures += 1
+                if failures >= self.failures:
+                    self.recover(f"stopped answering /system_stats ({failures} checks)", process)
+                    failures = 0
+
+    def recover(self, reason, process=None):
+        """Kill and relaunch the server, which failed while running process
+
+        One restart at a time: a caller whose process was already replaced
+        by the time it gets its turn has nothing left to do, and killing
+        the new process would fail the prompts resubmitted to it again.
+        """
+        with self._recover_lock:
+            if process is not None and self.instance.process is not process:
+                return
+            self._recover(reason)
+
+    def _recover(self, reason):
+        instance = self.instance
+        self._recovering.set()
+        try:
+            print(f"💥 ComfyUI ({instance.name}) {reason}, restarting. Last log lines:\n{instance.log.tail(20)}")
+            started = time.time()
+            instance.kill()
+            instance.launch(reason=reason)
+            instance.wait_ready()
+            self.restarts += 1
+            print(f"✅ ComfyUI ({instance.name}) restarted in {time.time() - started:.1f}s")
+        except Exception as e:
+            # The process is gone, so the next round tries again
+            print(f"❌ ComfyUI ({instance.name}) restart failed: {e}")
+            time.sleep(1)
+        finally:
+            self._recovering.clear()
+
+    def wait_ready(self, timeout=180):
+        """Block until the server is back up after a crash; False if it doesn't come back"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._recovering.is_set() and self.instance.running() and self.instance.client.is_up():
+                return True
+            # Don't wait for the next health check to notice
+            self._wake.set()
+            time.sleep(0.2)
+        return False
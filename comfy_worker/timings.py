@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# One structured JSON line per job with its stage timings, so p50/p99 per
+# stage can be computed from the fleet's logs; "0" turns them off
+TIMINGS_LOG = os.getenv("TIMINGS_LOG", "1") == "1"
+
+
+class Timings:
+    """Wall time per stage of one job, reported in milliseconds
+
+    Stages that run several times (fetch, encode per image) add up. Safe to
+    record into from the encode/upload pools.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def timed(self, stage, fn):
+        """fn wrapped so every call adds its duration to stage"""
+        def run(*args, **kwargs):
+            with self.stage(stage):
+                return fn(*args, **kwargs)
+        return run
+
+    def as_dict(self):
+        """{stage: milliseconds}, plus the job's total so far"""
+        with self._lock:
+            stages = dict(self._stages)
+        stages["total"] = time.perf_counter() - self.started
+        return {stage: round(seconds * 1000, 1) for stage, seconds in stages.items()}
+
+
+def log(event, **fields):
+    """Print one structured JSON log line"""
+    if TIMINGS_LOG:
+        print(json.dumps({"event": event, "time": round(time.time(), 3), **fields}), flush=True)
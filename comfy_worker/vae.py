@@ -0,0 +1,78 @@
+import math
+import os
+
+# Decodes of at least this many pixels per image use VAEDecodeTiled; 0
+# disables. Smaller ones always decode in one pass: the free VRAM at submit
+# time excludes the resident models, which ComfyUI offloads for a decode
+TILED_DECODE_PIXELS = int(os.getenv("TILED_DECODE_PIXELS", str(2048 * 1024)))
+
+# VRAM a decode takes per output pixel (ComfyUI's own estimate for these
+# VAEs in bf16) and the share of the free VRAM one tile may use
+DECODE_BYTES_PER_PIXEL = 4400
+DECODE_VRAM_SHARE = 0.5
+
+# Tile edges in pixels; without VRAM stats DEFAULT_TILE (ComfyUI's default)
+TILE_STEP = 64
+MIN_TILE = 256
+MAX_TILE = 2048
+DEFAULT_TILE = 512
+
+
+def latent_size(workflow, link):
+    """(width, height) of the empty latent a decode's samples come from, None if not found"""
+    seen = set()
+    while isinstance(link, list) and link and link[0] in workflow and link[0] not in seen:
+        seen.add(link[0])
+        inputs = workflow[link[0]].get("inputs") or {}
+        if "width" in inputs and "height" in inputs:
+            return int(inputs["width"]), int(inputs["height"])
+        link = inputs.get("samples") or inputs.get("latent_image")
+    return None
+
+
+def tile_settings(width, height, free_vram=None):
+    """(tile_size, overlap) in pixels for decoding a width × height image
+
+    Tiles are as large as DECODE_VRAM_SHARE of the free VRAM allows, but
+    at most half the longer side so the image is split at all; the overlap
+    is an eighth of the tile, like ComfyUI's 512/64 default.
+    """
+    if free_vram:
+        tile = math.isqrt(int(free_vram * DECODE_VRAM_SHARE / DECODE_BYTES_PER_PIXEL))
+    else:
+        tile = DEFAULT_TILE
+    half = math.ceil(max(width, height) / 2 / TILE_STEP) * TILE_STEP
+    tile = min(max(tile // TILE_STEP * TILE_STEP, MIN_TILE), MAX_TILE, max(half, MIN_TILE))
+    overlap = max(tile // 8 // 32 * 32, 32)
+    return tile, overlap
+
+
+def tiled_decodes(workflow, free_vram=None, threshold=TILED_DECODE_PIXELS):
+    """The workflow to submit: large VAEDecode nodes become VAEDecodeTiled
+
+    free_vram is /system_stats' vram_free in bytes (None if unknown), it
+    only sizes the tiles. Node ids and outputs stay the same, so the save
+    nodes are unaffected.
+    """
+    if threshold <= 0:
+        return workflow
+    converted = {}
+    for nid, node in workflow.items():
+        if node.get("class_type") == "VAEDecode":
+            size = latent_size(workflow, node["inputs"].get("samples"))
+            pixels = size[0] * size[1] if size else 0
+            if pixels and pixels >= threshold:
+                tile, overlap = tile_settings(*size, free_vram)
+                node = {
+                    "class_type": "VAEDecodeTiled",
+                    "inputs": {
+                        **node["inputs"],
+                        "tile_size": tile,
+                        "overlap": overlap,
+                        # Only used by video VAEs, required by newer ComfyUI
+                        "temporal_size": 64,
+                        "temporal_overlap": 8,
+                    },
+                }
+        converted[nid] = node
+    return converted
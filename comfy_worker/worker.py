@@ -0,0 +1,708 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import traceback
+import uuid
+
+import runpod
+
+from comfy_worker import encoding, sinks, timings
+from comfy_worker.aio import MAX_CONCURRENCY
+from comfy_worker.batch import output_images, parse_items
+from comfy_worker.boot import Boot
+from comfy_worker.conditioning import cached_encodes
+from comfy_worker.deadlines import JOB_TIMEOUT_MAX, job_timeout
+from comfy_worker.instances import ComfyInstance, InstancePool, detect_devices
+from comfy_worker.model_store import ModelStore
+from comfy_worker.models import get_model
+from comfy_worker.outputs import Janitor, output_workflow, remove_output, websocket_nodes
+from comfy_worker.precision import PRECISION, UNET_DIRS, QuantizedWeights, choose, parse_precision
+from comfy_worker.progress import ProgressUpdater, progress_output, wants_previews
+from comfy_worker.result_cache import ResultCache
+from comfy_worker.scheduler import BATCH_WINDOW_MS, MicroBatcher, queue_priority
+from comfy_worker.schema import normalize
+from comfy_worker.timings import Timings
+from comfy_worker.vae import tiled_decodes
+from comfy_worker.ws import PromptTimeout
+
+COMFYUI_PATH = "/root/ComfyUI"
+COMFYUI_PORT = 8188
+
+# Models to warm up once ComfyUI is running, comma separated; unset warms
+# the default model, empty disables the warm-up
+WARMUP_MODELS = os.getenv("WARMUP_MODELS")
+WARMUP_TIMEOUT = int(os.getenv("WARMUP_TIMEOUT", "600"))
+
+# "stream" serves the generator handler, yielding progress updates before the result
+HANDLER_MODE = os.getenv("HANDLER_MODE", "default")
+
+# Boot steps reported as stages of the first job's timings
+BOOT_STAGES = {
+    "download_models": "download",
+    "start_comfyui": "boot",
+    "quantize_models": "quantize",
+    "warm_up": "warmup",
+}
+
+
+class Worker:
+    """RunPod worker serving one or more registered models from ComfyUI
+
+    Owns the boot (model download + ComfyUI startup), the ComfyUI instances
+    (one per GPU, each with its clients and completion listener) and the
+    sync/async RunPod handlers. Jobs pick their model with the `model` input
+    field, defaulting to the first one, and run on the least loaded instance.
+    """
+
+    def __init__(
+        self, models, version, comfyui_path=COMFYUI_PATH, port=COMFYUI_PORT, preload=None, warmup=None, devices=None
+    ):
+        self.models = {name: get_model(name) for name in models}
+        self.default_model = models[0]
+        self.version = version
+        self.comfyui_path = comfyui_path
+        self.preload = list(preload if preload is not None else models)
+        for name in self.preload:
+            if name not in self.models:
+                raise ValueError(f"Preloaded model '{name}' is not served by this worker")
+        if warmup is None:
+            if WARMUP_MODELS is not None:
+                warmup = [m.strip() for m in WARMUP_MODELS.split(",") if m.strip()]
+            else:
+                warmup = [self.default_model]
+        self.warmup = [name for name in warmup if name in self.models and self.models[name].WARMUP]
+
+        # One ComfyUI per GPU on consecutive ports, each with pooled keep-alive
+        # clients and the websocket listener that tells us when a prompt is done
+        devices = devices if devices is not None else detect_devices()
+        self.instances = InstancePool(
+            ComfyInstance(comfyui_path, port + i, device) for i, device in enumerate(devices)
+        )
+        # Every instance takes MAX_CONCURRENCY jobs
+        self.concurrency = MAX_CONCURRENCY * len(self.instances)
+        self.store = ModelStore()
+        self.weights = QuantizedWeights(os.path.join(comfyui_path, "models"), self.store)
+        self.janitor = Janitor(
+            path for instance in self.instances for path in (instance.output_dir, os.path.join(instance.data_dir, "temp"))
+        )
+        self.batcher = (
+            MicroBatcher(self.execute_prompt, capacity=len(self.instances)) if BATCH_WINDOW_MS > 0 else None
+        )
+
+        # Seeded repeats are answered from disk without touching ComfyUI
+        self.result_caches = {name: ResultCache(name) for name in self.models}
+
+        self.downloaded = set()
+        self._download_locks = {name: threading.Lock() for name in self.models}
+        self.startup_lock = threading.Lock()
+        self._boot_reported = False
+
+        # Model download and ComfyUI startup run side by side, the fp8
+        # conversion and warm-up after both, and only then is the worker ready
+        self.boot = Boot(self.download_models, self.start_comfyui, after=(self.quantize_models, self.warm_up))
+
+    def model_files(self, model):
+        """Downloader entries for a model, with absolute target dirs"""
+        return [
+            dict(f, target_dir=os.path.join(self.comfyui_path, "models", f["target_dir"]))
+            for f in model.FILES
+        ]
+
+    def model_bytes(self, model):
+        """Size of a model's weights on disk, our estimate of its VRAM footprint"""
+        total = 0
+        for f in self.model_files(model):
+            try:
+                total += os.path.getsize(os.path.join(f["target_dir"], f["target_name"]))
+            except OSError:
+                pass
+        return total
+
+    def download_model(self, name):
+        """Download one model's files from HuggingFace (once per process)"""
+        model = self.models[name]
+        with self._download_locks[name]:
+            if name in self.downloaded:
+                return
+
+            print(f"📦 Downloading {model.LABEL} models...")
+            try:
+                # Into the (shared) model store, all files at once, large ones as parallel
+                # ranged chunks, resumable and verified, then symlinked into ComfyUI's models dir
+                self.store.fetch(self.model_files(model), token=os.getenv("HF_TOKEN") or None)
+            except Exception as e:
+                if not getattr(model, "EXPERIMENTAL", False):
+                    raise
+                print(f"   ⚠️ Could not download {model.LABEL} files: {e}")
+                print("   This model is experimental and may need adjustments")
+
+            self.downloaded.add(name)
+            print(f"🎉 {model.LABEL} models downloaded!")
+
+    def download_models(self):
+        """Download the preloaded models, side by side"""
+        errors = []
+
+        def run(name):
+            try:
+                self.download_model(name)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+
+        threads = [
+            threading.Thread(target=run, args=(name,), name=f"download-{name}", daemon=True)
+            for name in self.preload
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise RuntimeError(f"Download failed for {'; '.join(errors)}")
+
+    def start_comfyui(self):
+        """Start the ComfyUI servers in background (no-op for the ones running)"""
+        launched = []
+        for instance in self.instances:
+            if instance.launch():
+                print(f"🌐 Starting ComfyUI server ({instance.name}, port {instance.port})...")
+                launched.append(instance)
+
+        # They boot side by side, wait for all of them
+        for instance in launched:
+            instance.wait_ready()
+            print(f"✅ ComfyUI server ready! ({instance.name})")
+        self.janitor.start()
+
+    def concurrency_modifier(self, current_concurrency):
+        """RunPod concurrency_modifier: MAX_CONCURRENCY jobs per ComfyUI instance"""
+        return self.concurrency
+
+    def unet_files(self, model):
+        """Names of a model's diffusion model files, the ones UNETLoader loads"""
+        return [f["target_name"] for f in model.FILES if f["target_dir"] in UNET_DIRS]
+
+    def quantize_models(self):
+        """Make the fp8 copies the preloaded models load with under PRECISION
+
+        Converted once per model store; later cold starts read the half-size
+        copy. Only worth holding up the boot for when the store is on the
+        network volume: in a store that goes away with the worker, the first
+        prompt schedules the conversion in the background instead. Failures
+        are logged, ComfyUI then quantizes at load time.
+        """
+        if not self.store.persistent():
+            return
+        vram = [instance.vram_total() for instance in self.instances]
+        vram_total = min((v for v in vram if v), default=None)
+        for name in self.preload:
+            for unet_name in self.unet_files(self.models[name]):
+                dtype = PRECISION
+                if dtype == "auto":
+                    dtype = choose(self.weights.size(unet_name), vram_total)
+                if dtype == "default":
+                    continue
+                try:
+                    self.weights.ensure(unet_name, dtype)
+                except Exception as e:
+                    print(f"⚠️ Could not convert {unet_name} to {dtype}, ComfyUI will quantize at load: {e}")
+
+    def warm_up(self):
+        """Run a tiny generation per warm-up model so its weights are on the GPU(s)
+
+        ComfyUI loads models lazily on the first prompt that uses them;
+        without this the first real job pays for reading the safetensors and
+        moving them to VRAM. Failures are logged, the worker still starts.
+        """
+        if not self.warmup:
+            return
+
+        with self.startup_lock:
+            for instance in self.instances:
+                instance.listener.start()
+
+        # Every instance loads its own copy, side by side
+        threads = [
+            threading.Thread(target=self.warm_up_instance, args=(instance,), name=f"warmup-{instance.name}", daemon=True)
+            for instance in self.instances
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def warm_up_instance(self, instance):
+        for name in self.warmup:
+            model = self.models[name]
+            started = time.time()
+            try:
+                self.download_model(name)
+                instance.resident.acquire(name, self.model_bytes(model))
+
+                settings = model.WARMUP
+                items = [{"prompt": "warm-up", "seed": 0, "batch_size": 1}]
+                workflow, save_nodes = model.build_workflow(
+                    items,
+                    settings["width"],
+                    settings["height"],
+                    settings["steps"],
+                    model.DEFAULTS["cfg"],
+                    weight_dtype=PRECISION,
+                )
+                workflow = self.submission(workflow, instance, warm_up=True)
+                prompt_id = self.register_prompt(instance, workflow)
+                try:
+                    instance.client.queue_prompt(workflow, instance.listener.client_id, prompt_id=prompt_id)
+                except Exception:
+                    self.drop_prompt(instance, prompt_id)
+                    raise
+                try:
+                    outputs = instance.listener.wait(prompt_id, timeout=WARMUP_TIMEOUT)
+                except PromptTimeout:
+                    # Don't leave it in front of the first job
+                    instance.cancel(prompt_id)
+                    raise
+            except Exception as e:
+                print(f"⚠️ {model.LABEL} warm-up failed on {instance.name} after {time.time() - started:.1f}s: {e}")
+                continue
+
+            # The warm-up images are of no use to anyone
+            for img_info in output_images(outputs, save_nodes):
+                remove_output(instance.output_dir, img_info)
+            print(f"🔥 {model.LABEL} warm-up done on {instance.name} in {time.time() - started:.1f}s")
+
+    def ensure_started(self, model):
+        """Wait for the eager boot, make sure the model is on disk and ComfyUI is up"""
+        self.boot.wait()
+        self.download_model(model.NAME)
+        with self.startup_lock:
+            self.start_comfyui()
+            for instance in self.instances:
+                instance.listener.start()
+
+    def dispatch(self, model):
+        """Least loaded instance for a prompt of model, made room for; release with self.instances.release()"""
+        return self.instances.acquire(model.NAME, self.model_bytes(model))
+
+    def prepare(self, input_data):
+        """Parse job input into a job: model, workflow, SaveImage nodes to collect, encoding options and output sink
+
+        Sizes and steps are normalized to the model's limits and the job's
+        cost budget (comfy_worker/schema.py); the cost sets the job's
+        default timeout and its place in ComfyUI's queue.
+        """
+        name = input_data.get("model") or self.default_model
+        if name not in self.models:
+            raise ValueError(f"Model '{name}' is not served here, available: {', '.join(self.models)}")
+        model = self.models[name]
+
+        prompt = input_data.get("prompt", model.DEFAULTS["prompt"])
+        if not isinstance(prompt, str):
+            raise ValueError("prompt must be a string")
+        seed = input_data.get("seed")
+        if seed is None:
+            seed = random.randint(0, 2**32 - 1)
+        seed = int(seed)
+
+        items = parse_items(input_data, prompt, seed)
+        params, cost, adjusted = normalize(model, input_data, sum(item["batch_size"] for item in items))
+        params["weight_dtype"] = parse_precision(input_data)
+        for key, change in adjusted.items():
+            print(f"📐 {key} {change['requested']} → {change['used']}")
+        workflow, save_nodes = model.build_workflow(items, **params)
+        job = {
+            "model": model,
+            "items": items,
+            "params": params,
+            "workflow": workflow,
+            "save_nodes": save_nodes,
+            "cost": cost,
+            "adjusted": adjusted,
+            "timeout": job_timeout(input_data, cost),
+            "priority": queue_priority(cost),
+            "encode_options": encoding.parse_options(input_data),
+            "sink": sinks.get_sink(input_data),
+        }
+        print(f"🎨 Generating {model.LABEL}: {prompt[:50]}...")
+        return job
+
+    def store_image(self, job, data, key, index):
+        """Encode and store one image in the background, returns a Future"""
+        encoded = encoding.submit(data, job["encode_options"], timings=job["timings"])
+        return job["sink"].submit(encoded, f"{key}/{index}")
+
+    def record_boot(self, timings):
+        """Add the boot stages to the first job this worker serves (the cold start)"""
+        with self.startup_lock:
+            if self._boot_reported:
+                return
+            self._boot_reported = True
+        for step, stage in BOOT_STAGES.items():
+            if step in self.boot.durations:
+                timings.add(stage, self.boot.durations[step])
+
+    def execution_span(self, instance, prompt_id):
+        """ComfyUI's (started, finished) for a prompt, None if unknown"""
+        try:
+            return instance.listener.execution_span(prompt_id)
+        except Exception:
+            return None
+
+    def record_execution(self, timings, span, submitted):
+        """Queue wait and execution from ComfyUI's own timestamps"""
+        if span is not None:
+            started, finished = span
+            timings.add("queue_wait", max(started - submitted, 0.0))
+            timings.add("execution", max(finished - started, 0.0))
+
+    def success_response(self, job, results, cache):
+        if not results:
+            raise RuntimeError("No images in ComfyUI outputs")
+
+        model = job["model"]
+        status, image_key = model.RESPONSE
+        print(f"✅ {model.LABEL} generation complete! ({len(results)} images)")
+        response = {"status": status, "model": model.NAME}
+        if "base64" in results[0]:
+            response[image_key] = results[0]["base64"]
+        else:
+            response["image_url"] = results[0]["url"]
+        response.update(sinks.response_fields(results))
+        response["cache"] = cache
+        response["cost"] = round(job["cost"], 1)
+        if job["adjusted"]:
+            response["adjusted"] = job["adjusted"]
+        response["timings"] = job["timings"].as_dict()
+        timings.log("job", model=model.NAME, status="success", cache=cache, timings=response["timings"])
+        return response
+
+    def error_response(self, e, job_timings=None):
+        print(f"❌ Error: {e}")
+        traceback.print_exc()
+        response = {"status": "error", "error": str(e)}
+        # What ComfyUI printed last, when the error came from it
+        if getattr(e, "comfyui_log", None):
+            response["comfyui_log"] = e.comfyui_log
+        if job_timings is not None:
+            response["timings"] = job_timings.as_dict()
+            timings.log("job", status="error", error=str(e), timings=response["timings"])
+        return response
+
+    def handler(self, event):
+        """RunPod handler: generate images via the ComfyUI API"""
+        job_timings = Timings()
+        try:
+            print(f"🔖 Worker version: {self.version}")
+
+            # Parse input
+            with job_timings.stage("parse"):
+                input_data = event.get("input", {})
+                job = self.prepare(input_data)
+                job["timings"] = job_timings
+                if input_data.get("progress_updates"):
+                    job["on_progress"] = ProgressUpdater(event, previews=wants_previews(input_data))
+                key = sinks.job_key(event)
+                result_cache = self.result_caches[job["model"].NAME]
+
+            # Seeded repeats are served from the result cache, before ComfyUI is touched
+            with job_timings.stage("cache"):
+                cache_key = result_cache.key(job["workflow"], input_data)
+                cached = result_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                print("♻️ Result cache hit")
+                stored = [self.store_image(job, data, key, i) for i, data in enumerate(cached)]
+                with job_timings.stage("serialization"):
+                    results = [future.result() for future in stored]
+                return self.success_response(job, results, cache="hit")
+
+            # Download models, make sure ComfyUI is running, pick an instance the model fits on
+            with job_timings.stage("startup"):
+                self.ensure_started(job["model"])
+                instance = self.dispatch(job["model"])
+            self.record_boot(job_timings)
+
+            try:
+                prompt_id, outputs, submitted = self.run_prompt(instance, job, job_timings)
+            finally:
+                self.instances.release(instance)
+            self.record_execution(job_timings, self.execution_span(instance, prompt_id), submitted)
+
+            images = []
+            stored = []
+            for i, img_info in enumerate(output_images(outputs, job["save_nodes"])):
+                # Websocket images are already here; files are read (straight from the
+                # output dir, /view as fallback) and deleted. Then re-encode and store
+                # in the background while the next one is read
+                with job_timings.stage("fetch"):
+                    data = img_info.get("data")
+                    if data is None:
+                        data = instance.client.fetch_output(
+                            img_info.get("filename"), img_info.get("subfolder", ""), timeout=60
+                        )
+                        remove_output(instance.output_dir, img_info)
+                images.append(data)
+                stored.append(self.store_image(job, data, key, i))
+
+            if cache_key and images:
+                result_cache.put(cache_key, images)
+            # Wait for the background encode/base64/upload of every image
+            with job_timings.stage("serialization"):
+                results = [future.result() for future in stored]
+            return self.success_response(job, results, cache="miss" if cache_key else "bypass")
+
+        except Exception as e:
+            return self.error_response(e, job_timings)
+
+    async def async_handler(self, event, on_progress=None):
+        """Async variant of handler() so several jobs can be in flight per worker
+
+        on_progress, if given, receives the prompt's listener updates.
+        """
+        job_timings = Timings()
+        try:
+            print(f"🔖 Worker version: {self.version}")
+
+            with job_timings.stage("parse"):
+                input_data = event.get("input", {})
+                job = self.prepare(input_data)
+                job["timings"] = job_timings
+                if on_progress is None and input_data.get("progress_updates"):
+                    on_progress = ProgressUpdater(event, previews=wants_previews(input_data))
+                job["on_progress"] = on_progress
+                key = sinks.job_key(event)
+                result_cache = self.result_caches[job["model"].NAME]
+
+            with job_timings.stage("cache"):
+                cache_key = result_cache.key(job["workflow"], input_data)
+                cached = await asyncio.to_thread(result_cache.get, cache_key) if cache_key else None
+            if cached is not None:
+                print("♻️ Result cache hit")
+                stored = [asyncio.wrap_future(self.store_image(job, data, key, i)) for i, data in enumerate(cached)]
+                with job_timings.stage("serialization"):
+                    results = await asyncio.gather(*stored)
+                return self.success_response(job, results, cache="hit")
+
+            with job_timings.stage("startup"):
+                await asyncio.to_thread(self.ensure_started, job["model"])
+            self.record_boot(job_timings)
+
+            # Submitted on its own or, with BATCH_WINDOW_MS, coalesced with compatible jobs
+            if self.batcher is not None:
+                run = await self.batcher.run(job)
+            else:
+                run = dict(
+                    await self.execute_prompt(
+                        job["model"], job["workflow"], job["on_progress"], job["timeout"], job["priority"]
+                    ),
+                    save_nodes=job["save_nodes"],
+                )
+            if run.get("held"):
+                job_timings.add("batch_hold", run["held"])
+            job_timings.add("submit", run["submit"])
+            job_timings.add("generation", run["generation"])
+            self.record_execution(job_timings, run["span"], run["submitted"])
+
+            images = []
+            stored = []
+            for i, img_info in enumerate(output_images(run["outputs"], run["save_nodes"])):
+                with job_timings.stage("fetch"):
+                    data = img_info.get("data")
+                    if data is None:
+                        data = await run["instance"].aclient.fetch_output(
+                            img_info.get("filename"), img_info.get("subfolder", "")
+                        )
+                        remove_output(run["instance"].output_dir, img_info)
+                images.append(data)
+                stored.append(asyncio.wrap_future(self.store_image(job, data, key, i)))
+
+            if cache_key and images:
+                result_cache.put(cache_key, images)
+            with job_timings.stage("serialization"):
+                results = await asyncio.gather(*stored)
+            return self.success_response(job, results, cache="miss" if cache_key else "bypass")
+
+        except Exception as e:
+            return self.error_response(e, job_timings)
+
+    def submission(self, workflow, instance, warm_up=False):
+        """A model's workflow as submitted: cached encodes, UNet dtype, SaveImage per OUTPUT_MODE, tiled decodes
+
+        The warm-up's encodes skip the conditioning cache, so the text
+        encoder gets loaded too, and it leaves fp8 conversions to the jobs.
+        """
+        if not warm_up:
+            workflow = cached_encodes(workflow)
+        workflow = self.weights.resolve(workflow, instance.vram_total(), convert=not warm_up)
+        return tiled_decodes(output_workflow(workflow), instance.free_vram())
+
+    def run_prompt(self, instance, job, job_timings):
+        """Queue a job's workflow on instance and wait for it, returns (prompt_id, outputs, submitted)
+
+        If ComfyUI goes down under the prompt it is resubmitted once, after
+        the supervisor brought the server back. A prompt still running when
+        the job's timeout is up is cancelled on the server before this raises.
+        """
+        deadline = time.monotonic() + job["timeout"]
+        with instance.attach_log():
+            for attempt in range(2):
+                try:
+                    # Queue prompt
+                    workflow = self.submission(job["workflow"], instance)
+                    prompt_id = self.register_prompt(instance, workflow, job.get("on_progress"))
+                    try:
+                        with job_timings.stage("submit"):
+                            instance.client.queue_prompt(
+                                workflow, instance.listener.client_id, number=job.get("priority"), prompt_id=prompt_id
+                            )
+                    except Exception:
+                        self.drop_prompt(instance, prompt_id)
+                        raise
+                    submitted = time.time()
+
+                    # Wait for completion (websocket, with /history polling as fallback)
+                    print(f"⏳ Waiting for generation (prompt_id: {prompt_id}, {instance.name})...")
+                    try:
+                        with job_timings.stage("generation"):
+                            outputs = instance.listener.wait(prompt_id, timeout=max(deadline - time.monotonic(), 0))
+                    except PromptTimeout as e:
+                        instance.cancel(prompt_id)
+                        raise PromptTimeout(f"Job exceeded its {job['timeout']:g}s timeout, prompt cancelled") from e
+                    finally:
+                        instance.listener.unsubscribe(prompt_id)
+                    return prompt_id, outputs, submitted
+                except Exception as e:
+                    if attempt or isinstance(e, PromptTimeout) or not instance.crashed(e):
+                        raise
+                    self.await_restart(instance, job["model"], e)
+
+    def register_prompt(self, instance, workflow, on_progress=None):
+        """A new prompt_id for workflow on instance, known to its listener before it's queued
+
+        ComfyUI takes our prompt_id on /prompt. The socket can deliver the
+        SaveImageWebsocket frames before the POST returns (e.g. a resubmitted
+        prompt only re-runs the save node), so the listener has to know the
+        prompt's image nodes and progress subscriber first.
+        """
+        prompt_id = str(uuid.uuid4())
+        instance.listener.expect_images(prompt_id, websocket_nodes(workflow))
+        if on_progress is not None:
+            instance.listener.subscribe(prompt_id, on_progress)
+        return prompt_id
+
+    def drop_prompt(self, instance, prompt_id):
+        """Undo register_prompt() for a prompt that never got queued"""
+        instance.listener.unsubscribe(prompt_id)
+        instance.listener.forget(prompt_id)
+
+    def await_restart(self, instance, model, error):
+        """Block until a crashed instance is back so a prompt can be resubmitted, else re-raise error"""
+        print(f"🔁 {error}; resubmitting the prompt once ComfyUI ({instance.name}) is back")
+        if not instance.supervisor.wait_ready():
+            raise error
+        # The new process starts with empty VRAM
+        instance.resident.acquire(model.NAME, self.model_bytes(model))
+
+    async def execute_prompt(self, model, workflow, on_progress=None, timeout=None, priority=None):
+        """Queue a workflow of model on the least loaded instance and wait for it, off the event loop where it blocks
+
+        Resubmitted once if ComfyUI goes down under it, like run_prompt().
+        priority is its ComfyUI queue number (None: arrival order). When
+        timeout runs out or the calling task is cancelled (RunPod cancelling
+        the job), the prompt is cancelled on the server first.
+        """
+        started = time.perf_counter()
+        if timeout is None:
+            timeout = JOB_TIMEOUT_MAX
+        deadline = time.monotonic() + timeout
+        instance = await asyncio.to_thread(self.dispatch, model)
+        try:
+            with instance.attach_log():
+                for attempt in range(2):
+                    try:
+                        submitted_workflow = await asyncio.to_thread(self.submission, workflow, instance)
+                        prompt_id = self.register_prompt(instance, submitted_workflow, on_progress)
+                        try:
+                            await instance.aclient.queue_prompt(
+                                submitted_workflow, instance.listener.client_id, number=priority, prompt_id=prompt_id
+                            )
+                        except BaseException:
+                            self.drop_prompt(instance, prompt_id)
+                            raise
+                        submitted = time.time()
+                        submit = time.perf_counter() - started
+                        try:
+                            outputs = await asyncio.to_thread(
+                                instance.listener.wait, prompt_id, max(deadline - time.monotonic(), 0)
+                            )
+                        except PromptTimeout as e:
+                            await asyncio.to_thread(instance.cancel, prompt_id)
+                            raise PromptTimeout(f"Job exceeded its {timeout:g}s timeout, prompt cancelled") from e
+                        except asyncio.CancelledError:
+                            await asyncio.to_thread(instance.cancel, prompt_id)
+                            raise
+                        finally:
+                            instance.listener.unsubscribe(prompt_id)
+                        break
+                    except Exception as e:
+                        if attempt or isinstance(e, PromptTimeout) or not instance.crashed(e):
+                            raise
+                        await asyncio.to_thread(self.await_restart, instance, model, e)
+        finally:
+            self.instances.release(instance)
+        generation = time.perf_counter() - started - submit
+        span = await asyncio.to_thread(self.execution_span, instance, prompt_id)
+        return {
+            "instance": instance,
+            "prompt_id": prompt_id,
+            "outputs": outputs,
+            "submitted": submitted,
+            "submit": submit,
+            "generation": generation,
+            "span": span,
+        }
+
+    async def stream_handler(self, event):
+        """Generator variant of async_handler(): yields progress updates, then the result
+
+        Progress is {"status": "progress", "step", "steps", "progress", "node"};
+        with `previews` in the input (and PREVIEW_METHOD set) low-res frames
+        come as {"status": "preview", "format", "image"}. The last item is
+        the regular response.
+        """
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        previews = wants_previews(event.get("input", {}))
+
+        def on_progress(update):
+            # Listener thread -> event loop
+            if update["type"] == "progress" or previews:
+                loop.call_soon_threadsafe(updates.put_nowait, update)
+
+        task = asyncio.ensure_future(self.async_handler(event, on_progress=on_progress))
+        while not task.done():
+            getter = asyncio.ensure_future(updates.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield progress_output(getter.result())
+            else:
+                getter.cancel()
+        while not updates.empty():
+            yield progress_output(updates.get_nowait())
+        yield task.result()
+
+    def serve(self):
+        """Boot in the background and start the RunPod serverless worker"""
+        self.boot.start()
+
+        if HANDLER_MODE == "stream":
+            config = {"handler": self.stream_handler, "return_aggregate_stream": True}
+            if self.concurrency > 1:
+                config["concurrency_modifier"] = self.concurrency_modifier
+            runpod.serverless.start(config)
+        # Async with a concurrency modifier when more than one job fits (MAX_CONCURRENCY or several GPUs)
+        elif self.concurrency > 1:
+            runpod.serverless.start({"handler": self.async_handler, "concurrency_modifier": self.concurrency_modifier})
+        else:
+            runpod.serverless.start({"handler": self.handler})
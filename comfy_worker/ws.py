@@ -0,0 +1,356 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+import websocket
+
+# How many finished prompts to remember for waiters that register late
+FINISHED_BACKLOG = 256
+
+# Messages whose ComfyUI timestamps mark a prompt's execution start/end
+EXECUTION_EVENTS = ("execution_start", "execution_success", "execution_error", "execution_interrupted")
+
+# Binary /ws frame types carrying latent previews
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+PREVIEW_FORMATS = {1: "jpeg", 2: "png"}
+
+# Even with a healthy socket, ask /history every so often in case a message was missed
+HISTORY_RECHECK = 5.0
+
+# How long to wait for the socket when /history says a prompt with websocket
+# outputs is done but the images haven't come through yet
+WEBSOCKET_OUTPUT_GRACE = 2.0
+
+
+class PromptTimeout(RuntimeError):
+    """A prompt didn't finish within the time it was given"""
+
+
+class CompletionListener:
+    """Persistent ComfyUI /ws client that resolves prompt_ids as soon as they finish"""
+
+    def __init__(self, client, client_id=None):
+        self.client = client
+        self.host = client.host
+        self.client_id = client_id or uuid.uuid4().hex
+        self.connected = threading.Event()
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._waiters = {}
+        self._outputs = {}
+        self._finished = OrderedDict()
+        self._timestamps = OrderedDict()
+        self._subscribers = {}
+        self._websocket_nodes = {}
+        self._websocket_images = {}
+        self._executing = None
+        self._executing_node = None
+        self._thread = None
+
+    def start(self, wait=5.0):
+        """Start the listener thread (idempotent) and give it a moment to connect"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="comfyui-ws", daemon=True)
+            self._thread.start()
+        self.connected.wait(wait)
+
+    def _run(self):
+        url = f"ws://{self.host}/ws?clientId={self.client_id}"
+        while True:
+            try:
+                ws = websocket.create_connection(url, timeout=10)
+            except Exception:
+                time.sleep(1)
+                continue
+
+            ws.settimeout(None)
+            with self._lock:
+                self.connections += 1
+            self.connected.set()
+            print("🔌 ComfyUI websocket connected")
+            try:
+                while True:
+                    message = ws.recv()
+                    # Binary frames are latent previews
+                    if isinstance(message, str):
+                        self._handle(json.loads(message))
+                    else:
+                        self._handle_preview(message)
+            except Exception as e:
+                print(f"⚠️ ComfyUI websocket dropped, falling back to /history polling: {e}")
+            finally:
+                self.connected.clear()
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+            time.sleep(0.5)
+
+    def _handle(self, message):
+        msg_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+
+        if msg_type in EXECUTION_EVENTS and data.get("timestamp") is not None:
+            with self._lock:
+                self._timestamps.setdefault(prompt_id, {})[msg_type] = data["timestamp"] / 1000
+                while len(self._timestamps) > FINISHED_BACKLOG:
+                    self._timestamps.popitem(last=False)
+
+        if msg_type == "execution_start" or (msg_type == "executing" and data.get("node") is not None):
+            self._executing = prompt_id
+            self._executing_node = data.get("node")
+        elif msg_type == "progress":
+            self._notify(prompt_id, {
+                "type": "progress",
+                "step": data.get("value"),
+                "steps": data.get("max"),
+                "node": data.get("node"),
+            })
+
+        if msg_type == "executed":
+            with self._lock:
+                self._outputs.setdefault(prompt_id, {})[data.get("node")] = data.get("output") or {}
+        elif msg_type == "execution_success" or (msg_type == "executing" and data.get("node") is None):
+            self._resolve(prompt_id, outputs=None)
+        elif msg_type == "execution_error":
+            self._resolve(prompt_id, error=RuntimeError(
+                f"ComfyUI execution failed in node {data.get('node_id')}: "
+                f"{data.get('exception_type')}: {data.get('exception_message')}"
+            ))
+        elif msg_type == "execution_interrupted":
+            self._resolve(prompt_id, error=RuntimeError("ComfyUI execution was interrupted"))
+
+    def _handle_preview(self, message):
+        if len(message) < 8:
+            return
+        event_type = int.from_bytes(message[:4], "big")
+        if event_type == PREVIEW_IMAGE:
+            # No prompt_id in the frame, it belongs to whatever is executing
+            prompt_id = self._executing
+            image_format = PREVIEW_FORMATS.get(int.from_bytes(message[4:8], "big"), "jpeg")
+            image = message[8:]
+        elif event_type == PREVIEW_IMAGE_WITH_METADATA:
+            size = int.from_bytes(message[4:8], "big")
+            try:
+                metadata = json.loads(message[8:8 + size])
+            except ValueError:
+                return
+            prompt_id = metadata.get("prompt_id") or self._executing
+            image_format = str(metadata.get("image_type", "image/jpeg")).split("/")[-1]
+            image = message[8 + size:]
+        else:
+            return
+        if not prompt_id:
+            return
+
+        # Frames sent while a SaveImageWebsocket node runs are its output images
+        with self._lock:
+            node = self._executing_node
+            if node in self._websocket_nodes.get(prompt_id, ()):
+                self._websocket_images.setdefault(prompt_id, {}).setdefault(node, []).append(
+                    {"data": bytes(image), "format": image_format, "type": "websocket"}
+                )
+                return
+        self._notify(prompt_id, {"type": "preview", "format": image_format, "data": bytes(image)})
+
+    def expect_images(self, prompt_id, node_ids):
+        """Collect the images node_ids (SaveImageWebsocket) send over the socket as prompt_id's outputs
+
+        They show up in the outputs as {"images": [{"data", "format", "type": "websocket"}]}.
+        """
+        if node_ids:
+            with self._lock:
+                self._websocket_nodes[prompt_id] = set(node_ids)
+
+    def _with_websocket_images(self, prompt_id, outputs):
+        # Call with self._lock held
+        self._websocket_nodes.pop(prompt_id, None)
+        images = self._websocket_images.pop(prompt_id, None)
+        if not images:
+            return outputs
+        outputs = dict(outputs or {})
+        for node, node_images in images.items():
+            outputs[node] = dict(outputs.get(node) or {}, images=node_images)
+        return outputs
+
+    def subscribe(self, prompt_id, callback):
+        """Call callback(update) for the prompt's progress and preview updates
+
+        Updates are {"type": "progress", "step", "steps", "node"} or
+        {"type": "preview", "format", "data"}; callbacks run on the listener
+        thread and must not block.
+        """
+        with self._lock:
+            self._subscribers.setdefault(prompt_id, []).append(callback)
+
+    def unsubscribe(self, prompt_id):
+        with self._lock:
+            self._subscribers.pop(prompt_id, None)
+
+    def _notify(self, prompt_id, update):
+        with self._lock:
+            callbacks = list(self._subscribers.get(prompt_id, ()))
+        for callback in callbacks:
+            try:
+                callback(update)
+            except Exception as e:
+                print(f"⚠️ Progress callback failed: {e}")
+
+    def _resolve(self, prompt_id, outputs=None, error=None):
+        with self._lock:
+            if outputs is None:
+                outputs = self._outputs.pop(prompt_id, {})
+            outputs = self._with_websocket_images(prompt_id, outputs)
+            waiter = self._waiters.pop(prompt_id, None)
+            if waiter is None:
+                # Nobody is waiting (yet) - keep the result for a late watch(); the
+                # first resolve wins, a trailing "executing" has no images left
+                self._finished.setdefault(prompt_id, (outputs, error))
+                while len(self._finished) > FINISHED_BACKLOG:
+                    self._finished.popitem(last=False)
+                return
+
+        if waiter.done():
+            return
+        if error is not None:
+            waiter.set_exception(error)
+        else:
+            waiter.set_result(outputs)
+
+    def watch(self, prompt_id):
+        """Return a Future resolved with the prompt's {node_id: output} once it finishes"""
+        with self._lock:
+            finished = self._finished.pop(prompt_id, None)
+            if finished is None:
+                return self._waiters.setdefault(prompt_id, Future())
+
+        future = Future()
+        outputs, error = finished
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(outputs)
+        return future
+
+    def fail_all(self, error):
+        """Fail every prompt being waited for, e.g. when ComfyUI died under them"""
+        with self._lock:
+            waiters = list(self._waiters.values())
+            self._waiters.clear()
+            self._outputs.clear()
+            self._websocket_nodes.clear()
+            self._websocket_images.clear()
+            self._executing = None
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    def forget(self, prompt_id):
+        with self._lock:
+            self._waiters.pop(prompt_id, None)
+            self._outputs.pop(prompt_id, None)
+            self._finished.pop(prompt_id, None)
+            self._websocket_nodes.pop(prompt_id, None)
+            self._websocket_images.pop(prompt_id, None)
+
+    def poll_history(self, prompt_id):
+        """Single /history lookup; returns outputs if the prompt finished, else None"""
+        entry = self.client.history(prompt_id)
+        if entry is None:
+            return None
+
+        status = entry.get("status") or {}
+        if status.get("status_str") == "error":
+            raise RuntimeError(f"ComfyUI execution failed: {status.get('messages')}")
+        return entry.get("outputs", {})
+
+    def _history_outputs(self, prompt_id, outputs, future):
+        """/history outputs of a finished prompt, plus the images its websocket nodes sent
+
+        /history can be ahead of the socket, so give the socket a moment to
+        deliver them first.
+        """
+        with self._lock:
+            expected = prompt_id in self._websocket_nodes
+        if expected and self.connected.is_set():
+            try:
+                return future.result(timeout=WEBSOCKET_OUTPUT_GRACE)
+            except Exception:
+                pass
+        with self._lock:
+            return self._with_websocket_images(prompt_id, outputs)
+
+    def execution_span(self, prompt_id):
+        """(started, finished) epoch seconds of a finished prompt per ComfyUI, or None
+
+        From the websocket messages, else from the /history status messages.
+        """
+        with self._lock:
+            stamps = self._timestamps.pop(prompt_id, {})
+        if "execution_start" not in stamps or len(stamps) < 2:
+            entry = self.client.history(prompt_id) or {}
+            for name, data in (entry.get("status") or {}).get("messages") or []:
+                if name in EXECUTION_EVENTS and data.get("timestamp") is not None:
+                    stamps[name] = data["timestamp"] / 1000
+
+        started = stamps.pop("execution_start", None)
+        finished = max(stamps.values(), default=None)
+        if started is None or finished is None:
+            return None
+        return started, finished
+
+    def wait(self, prompt_id, timeout=120, poll_interval=1.0):
+        """Block until prompt_id finishes and return its outputs
+
+        Uses the websocket when it is up and polls /history while it is down.
+        """
+        future = self.watch(prompt_id)
+        deadline = time.monotonic() + timeout
+        seen = self.connections
+        last_check = time.monotonic()
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PromptTimeout(f"Prompt {prompt_id} didn't finish within {timeout:.0f}s")
+                # Failed by fail_all() while the socket is down
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+
+                if self.connected.is_set() and seen == self.connections and time.monotonic() - last_check < HISTORY_RECHECK:
+                    try:
+                        outputs = future.result(timeout=min(remaining, 1.0))
+                    except FutureTimeout:
+                        continue
+                    if _has_images(outputs):
+                        return outputs
+                    # Cached nodes may not re-send "executed", /history has the full picture
+                    return self.poll_history(prompt_id) or outputs
+
+                # Socket is down, reconnected (and may have missed messages) or due a recheck
+                seen = self.connections
+                last_check = time.monotonic()
+                try:
+                    outputs = self.poll_history(prompt_id)
+                except requests.RequestException as e:
+                    print(f"⚠️ /history poll failed: {e}")
+                    outputs = None
+                if outputs is not None:
+                    return self._history_outputs(prompt_id, outputs, future)
+                if not self.connected.is_set():
+                    time.sleep(min(poll_interval, max(remaining, 0)))
+        finally:
+            self.forget(prompt_id)
+
+
+def _has_images(outputs):
+    return any("images" in node_output for node_output in (outputs or {}).values())
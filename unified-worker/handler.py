@@ -0,0 +1,22 @@
+import os
+
+from comfy_worker.models import MODELS
+from comfy_worker.worker import Worker
+
+WORKER_VERSION = "v1"
+
+# Models this worker serves (first is the default) and the ones downloaded at boot;
+# the rest are downloaded on their first request
+SERVED_MODELS = [m.strip() for m in os.getenv("MODELS", ",".join(MODELS)).split(",") if m.strip()]
+PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", ",".join(SERVED_MODELS)).split(",") if m.strip()]
+
+# One ComfyUI for every model, jobs pick one with the `model` input field
+worker = Worker(SERVED_MODELS, WORKER_VERSION, preload=PRELOAD_MODELS)
+
+# RunPod handlers
+handler = worker.handler
+async_handler = worker.async_handler
+
+
+if __name__ == "__main__":
+    worker.serve()